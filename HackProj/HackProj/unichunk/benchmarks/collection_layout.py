@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Collection layout benchmark
+# One collection per PDF (queried with FanoutRetriever) versus one shared
+# collection filtered by pdf_name (UnifiedRetriever), on random vectors so the
+# embedding model is not part of the measurement
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from retrieval.fanout import FanoutRetriever
+from retrieval.unified import UnifiedRetriever
+from vector_store.store_chroma import ChromaStore
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def timed_queries(fn, queries):
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {'p50_ms': percentile(latencies, 50), 'p95_ms': percentile(latencies, 95)}
+
+
+def build(client, layout, doc_names, vectors, chunks_per_doc):
+    start = time.perf_counter()
+    stores = []
+    if layout == 'unified':
+        store = ChromaStore(client=client, collection_name='unichunks')
+        ids, metas = [], []
+        for name in doc_names:
+            for c in range(chunks_per_doc):
+                ids.append(f"{name}-{c}")
+                metas.append({'pdf_name': name, 'page_no': c // 4 + 1, 'chunk_idx': c % 4})
+        # Chroma caps the size of a single insert, so add in slices
+        for i in range(0, len(ids), 5000):
+            store.add_chunks(documents=[''] * len(ids[i:i + 5000]), metadatas=metas[i:i + 5000], ids=ids[i:i + 5000], embeddings=vectors[i:i + 5000].tolist())
+        stores.append(store)
+    else:
+        for d, name in enumerate(doc_names):
+            store = ChromaStore(client=client, collection_name=name)
+            rows = vectors[d * chunks_per_doc:(d + 1) * chunks_per_doc]
+            store.add_chunks(
+                documents=[''] * chunks_per_doc,
+                metadatas=[{'pdf_name': name, 'page_no': c // 4 + 1, 'chunk_idx': c % 4} for c in range(chunks_per_doc)],
+                ids=[f"{name}-{c}" for c in range(chunks_per_doc)],
+                embeddings=rows.tolist()
+            )
+            stores.append(store)
+    return stores, time.perf_counter() - start
+
+
+def run(num_docs, chunks_per_doc, dim, num_queries, k, subset):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((num_docs * chunks_per_doc, dim)).astype(np.float32)
+    queries = rng.standard_normal((num_queries, dim)).astype(np.float32)
+    doc_names = [f"doc_{i:05d}" for i in range(num_docs)]
+    picked = random.Random(0).sample(doc_names, min(subset, num_docs))
+    results = {}
+    for layout in ('per_pdf', 'unified'):
+        path = tempfile.mkdtemp(prefix=f'chroma_{layout}_')
+        try:
+            client = chromadb.Client(Settings(persist_directory=path, is_persistent=True, anonymized_telemetry=False))
+            stores, build_seconds = build(client, layout, doc_names, vectors, chunks_per_doc)
+            if layout == 'unified':
+                all_docs = UnifiedRetriever(stores[0], embedder=None)
+                some_docs = UnifiedRetriever(stores[0], embedder=None, pdf_names=picked)
+            else:
+                all_docs = FanoutRetriever([s.collection for s in stores], embedder=None)
+                some_docs = FanoutRetriever([s.collection for s in stores if s.collection.name in picked], embedder=None)
+            results[layout] = {
+                'build_seconds': build_seconds,
+                'query_all_docs': timed_queries(lambda q: all_docs.query(embedding=q, k=k), queries),
+                f'query_{len(picked)}_docs': timed_queries(lambda q: some_docs.query(embedding=q, k=k), queries),
+            }
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+        r = results[layout]
+        print(f"{num_docs:>5} docs  {layout:<8} build {r['build_seconds']:.1f}s  "
+              f"all docs p50 {r['query_all_docs']['p50_ms']:.1f}ms p95 {r['query_all_docs']['p95_ms']:.1f}ms  "
+              f"{len(picked)} docs p50 {r[f'query_{len(picked)}_docs']['p50_ms']:.1f}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-PDF collections against one shared collection")
+    parser.add_argument('--docs', default='100,1000', help="Comma-separated document counts")
+    parser.add_argument('--chunks-per-doc', type=int, default=20)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--subset', type=int, default=5, help="Documents selected for the filtered query")
+    parser.add_argument('--out', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {n: run(int(n), args.chunks_per_doc, args.dim, args.queries, args.k, args.subset) for n in args.docs.split(',')}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Embedding backend benchmark
+# Compares each text embedding backend against full-precision torch on
+# throughput (texts/sec) and retrieval parity (recall@k of the torch top-k)
+
+import argparse
+import glob
+import json
+import random
+import time
+
+import numpy as np
+
+from embedding.text_embedder import TextEmbedder
+from embedding.backends import TEXT_BACKENDS
+from utils.config import OUTPUT_DIR
+
+
+def load_corpus(limit):
+    # Page texts from previous ingestions (output/<collection>.json), split into paragraphs
+    texts = []
+    for path in sorted(glob.glob(os.path.join(OUTPUT_DIR, '*.json'))):
+        try:
+            with open(path) as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(pages, list):
+            continue
+        for page in pages:
+            if isinstance(page, dict):
+                texts.extend(p.strip() for p in page.get('text', '').split('\n\n') if len(p.strip()) > 40)
+    if not texts:
+        words = ("device clinical evaluation notified body regulation annex conformity assessment "
+                 "manufacturer risk software classification post-market surveillance vigilance").split()
+        rng = random.Random(0)
+        texts = [' '.join(rng.choice(words) for _ in range(rng.randint(5, 120))) for _ in range(limit)]
+    return texts[:limit]
+
+
+def top_k(queries, corpus, k):
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run(backends, corpus, queries, k, batch_size):
+    results = {}
+    reference = None
+    for name in backends:
+        embedder = TextEmbedder(backend=name)
+        embedder.backend.encode(corpus[:batch_size], batch_size=batch_size)  # warm-up
+        start = time.perf_counter()
+        corpus_vecs = embedder.backend.encode(corpus, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        query_vecs = embedder.backend.encode(queries, batch_size=batch_size)
+        neighbours = top_k(query_vecs, corpus_vecs, k)
+        result = {'texts_per_sec': len(corpus) / elapsed, 'seconds': elapsed}
+        if reference is None:
+            reference = (corpus_vecs, neighbours)
+        ref_vecs, ref_neighbours = reference
+        overlap = [len(set(a) & set(b)) / k for a, b in zip(neighbours, ref_neighbours)]
+        cosine = np.sum(corpus_vecs * ref_vecs, axis=1) / (np.linalg.norm(corpus_vecs, axis=1) * np.linalg.norm(ref_vecs, axis=1))
+        result[f'recall@{k}'] = float(np.mean(overlap))
+        result['mean_cosine_to_reference'] = float(np.mean(cosine))
+        results[name] = result
+        print(f"{name:<12} {result['texts_per_sec']:>9.1f} texts/sec  recall@{k}={result[f'recall@{k}']:.3f}  cos={result['mean_cosine_to_reference']:.4f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text embedding backends")
+    parser.add_argument('--backends', default=','.join(TEXT_BACKENDS), help="Comma-separated backends; the first is the reference")
+    parser.add_argument('--corpus-size', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--out', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_size)
+    rng = random.Random(1)
+    queries = [' '.join(t.split()[:12]) for t in rng.sample(corpus, min(args.queries, len(corpus)))]
+    print(f"Corpus: {len(corpus)} texts, {len(queries)} queries")
+    results = run(args.backends.split(','), corpus, queries, args.k, args.batch_size)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Hybrid retrieval latency benchmark
+# Ingests a corpus into a scratch index and times the same queries through the
+# dense retriever alone, BM25 alone and the hybrid retriever (BM25 runs next
+# to the dense query and the rankings are fused). Query embeddings are computed
+# once up front, so only retrieval is timed. Hybrid p50 should stay close to
+# dense-only; the gap is the fusion plus whatever BM25 takes beyond the dense
+# query. Runs on the synthetic corpus unless --corpus is given.
+
+import argparse
+import glob
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.rag_latency import ingest, load_queries
+from benchmarks.synthetic_corpus import generate_corpus
+from embedding.text_embedder import TextEmbedder
+from ingestion.indexer import DocumentIndexer
+from retrieval.factory import open_client, build_retriever
+from retrieval.hybrid import HybridRetriever
+from retrieval.lexical_index import LexicalIndex
+from utils.config import RETRIEVAL_TOP_K, HYBRID_CANDIDATES
+
+MODES = ('dense', 'bm25', 'hybrid')
+
+
+def percentiles(values):
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+    }
+
+
+def replay(queries, embeddings, dense, hybrid, lexical_index, pdf_names, k, rounds):
+    runs = {
+        'dense': lambda q, e: dense.query(q, k=k, embedding=e),
+        'bm25': lambda q, e: lexical_index.search(q, HYBRID_CANDIDATES, pdf_names),
+        'hybrid': lambda q, e: hybrid.query(q, k=k, embedding=e),
+    }
+    # One untimed pass maps the segments and warms the thread pool
+    for mode in MODES:
+        for query, embedding in zip(queries, embeddings):
+            runs[mode](query, embedding)
+    samples = {mode: [] for mode in MODES}
+    for _ in range(rounds):
+        for query, embedding in zip(queries, embeddings):
+            # Modes alternate per query, so drift over the run hits all of them alike
+            for mode in MODES:
+                start = time.perf_counter()
+                runs[mode](query, embedding)
+                samples[mode].append((time.perf_counter() - start) * 1000)
+    return {mode: percentiles(values) for mode, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dense-only vs hybrid (BM25 + dense) retrieval latency")
+    parser.add_argument('--corpus', help="Directory of PDFs to ingest (default: a synthetic corpus)")
+    parser.add_argument('--pages', type=int, default=20, help="Pages per synthetic document")
+    parser.add_argument('--num-queries', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=3, help="Timed passes over the query set")
+    parser.add_argument('--k', type=int, default=RETRIEVAL_TOP_K)
+    parser.add_argument('--layout', choices=('unified', 'per_pdf'), help="Collection layout (default: config)")
+    parser.add_argument('--out', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='unichunk_hybrid_')
+    try:
+        if args.corpus:
+            pdf_paths = sorted(glob.glob(os.path.join(args.corpus, '**', '*.pdf'), recursive=True))
+            if not pdf_paths:
+                parser.error(f"No PDFs found under {args.corpus}")
+        else:
+            corpus = generate_corpus(os.path.join(workdir, 'corpus'), (args.pages,), ('digital', 'tables', 'mixed'))
+            pdf_paths = [path for paths in corpus.values() for path in paths]
+
+        client = open_client(os.path.join(workdir, 'chroma_db'))
+        lexical_index = LexicalIndex(os.path.join(workdir, 'lexical_index'))
+        embedder = TextEmbedder(use_cache=False)
+        indexer = DocumentIndexer(client, embedder, lexical_index, output_dir=workdir, embed_images=False)
+        pdf_names, ingest_stats = ingest(indexer, pdf_paths)
+        indexer.close()
+        print(f"Ingested {ingest_stats['documents']} PDFs, {ingest_stats['pages']} pages, {ingest_stats['chunks']} chunks")
+
+        layout = {'layout': args.layout} if args.layout else {}
+        dense = build_retriever(client, embedder, pdf_names, hybrid=False, **layout)
+        hybrid = HybridRetriever(dense, lexical_index, pdf_names=pdf_names)
+        queries = load_queries(None, lexical_index, pdf_names, args.num_queries)
+        embeddings = embedder.embed(queries)
+        results = replay(queries, embeddings, dense, hybrid, lexical_index, pdf_names, args.k, args.rounds)
+
+        print(f"{len(queries)} queries x {args.rounds} rounds")
+        for mode, r in results.items():
+            print(f"{mode:<7} p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  p99 {r['p99_ms']:8.2f}ms")
+        overhead = results['hybrid']['p50_ms'] - results['dense']['p50_ms']
+        print(f"hybrid overhead at p50: {overhead:+.2f}ms ({overhead / max(results['dense']['p50_ms'], 1e-9):+.0%})")
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump({'ingest': ingest_stats, 'queries': len(queries), 'rounds': args.rounds, 'retrieval': results}, f, indent=2)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
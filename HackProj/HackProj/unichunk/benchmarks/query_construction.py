@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Query construction benchmark
+# Replays recorded conversations against the ingested index and compares the
+# old retrieval query (last five chat turns joined) with queries built by
+# QueryBuilder from the current question. Reports retrieval latency, query
+# length and hit@k against the pages annotated for each turn.
+#
+# Conversation file (JSON list):
+# [{"pdf_names": ["MDCG_2019-11"],
+#   "turns": [{"question": "...", "answer": "...", "expected_pages": [12, 13]}, ...]}]
+# "answer" is the recorded agent reply (used to rebuild the old chat prompt) and
+# "expected_pages" is optional; turns without it only count towards latency.
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from embedding.text_embedder import TextEmbedder
+from retrieval.factory import open_client, build_retriever
+from retrieval.query_builder import QueryBuilder
+from utils.config import RETRIEVAL_TOP_K
+
+STRATEGIES = ('concatenated', 'current', 'rewrite', 'rewrite+history')
+
+
+def make_query(strategy, builders, embedder, transcript, question, previous):
+    if strategy == 'concatenated':
+        chat_prompt = "\n".join(f"{m['role']}: {m['content']}" for m in transcript[-5:])
+        return {'text': chat_prompt, 'embedding': embedder.embed([chat_prompt])[0]}
+    return builders[strategy].build(question, previous)
+
+
+def run(conversations, k, strategies):
+    embedder = TextEmbedder()
+    client = open_client()
+    builders = {
+        'current': QueryBuilder(embedder, rewrite=False),
+        'rewrite': QueryBuilder(embedder, rewrite=True),
+        'rewrite+history': QueryBuilder(embedder, rewrite=True, history_weight=0.3),
+    }
+    results = {}
+    for strategy in strategies:
+        latencies, lengths, hits, judged = [], [], 0, 0
+        for conv in conversations:
+            retriever = build_retriever(client, embedder, conv['pdf_names'])
+            transcript, previous = [], []
+            for turn in conv['turns']:
+                transcript.append({'role': 'user', 'content': turn['question']})
+                start = time.perf_counter()
+                query = make_query(strategy, builders, embedder, transcript, turn['question'], previous)
+                found = retriever.query(query['text'], k=k, embedding=query['embedding'])
+                latencies.append((time.perf_counter() - start) * 1000)
+                lengths.append(len(query['text'].split()))
+                if turn.get('expected_pages'):
+                    judged += 1
+                    pages = {int(h['metadata'].get('page_no', -1)) for h in found}
+                    hits += bool(pages & set(turn['expected_pages']))
+                previous.append(turn['question'])
+                transcript.append({'role': 'agent', 'content': turn.get('answer', '')})
+        results[strategy] = {
+            'p50_ms': float(np.percentile(latencies, 50)) if latencies else 0.0,
+            'p95_ms': float(np.percentile(latencies, 95)) if latencies else 0.0,
+            'mean_query_words': float(np.mean(lengths)) if lengths else 0.0,
+            f'hit@{k}': hits / judged if judged else None,
+            'judged_turns': judged
+        }
+        r = results[strategy]
+        hit = f"{r[f'hit@{k}']:.3f}" if r[f'hit@{k}'] is not None else 'n/a'
+        print(f"{strategy:<16} p50 {r['p50_ms']:.1f}ms  p95 {r['p95_ms']:.1f}ms  "
+              f"{r['mean_query_words']:.0f} words/query  hit@{k} {hit} ({judged} judged)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieval query construction strategies on recorded conversations")
+    parser.add_argument('conversations', help="Path to the recorded conversation JSON")
+    parser.add_argument('--k', type=int, default=RETRIEVAL_TOP_K)
+    parser.add_argument('--strategies', default=','.join(STRATEGIES))
+    parser.add_argument('--out', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with open(args.conversations) as f:
+        conversations = json.load(f)
+    results = run(conversations, args.k, args.strategies.split(','))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# End-to-end RAG latency benchmark
+# Ingests a fixed PDF corpus into a scratch index, replays a query set through
+# the chat path (query embedding, retrieval, optional rerank, prompt building,
+# answer generation) and reports p50/p95/p99 per stage. Uses the offline echo
+# generator by default, so it runs without network access or an API key.
+
+import argparse
+import glob
+import json
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from embedding.text_embedder import TextEmbedder
+from generation.context_builder import ContextBuilder
+from generation.generators import EchoGenerator, build_generator
+from ingestion.indexer import DocumentIndexer
+from retrieval.factory import open_client, build_retriever
+from retrieval.lexical_index import LexicalIndex
+from retrieval.query_builder import QueryBuilder
+from utils.config import DATA_DIR, RETRIEVAL_TOP_K, RERANK_CANDIDATES, RERANK_TOP_K
+
+STAGES = ('embed', 'retrieve', 'rerank', 'prompt_build', 'first_token', 'generate', 'total')
+
+
+def summarize(samples):
+    return {
+        stage: {
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+        }
+        for stage, values in samples.items() if values
+    }
+
+
+def load_queries(path, lexical_index, pdf_names, count):
+    if path:
+        with open(path) as f:
+            if path.endswith('.json'):
+                return json.load(f)
+            return [line.strip() for line in f if line.strip()]
+    # Without a query set, ask about the opening words of randomly chosen chunks
+    rng = random.Random(0)
+    texts = []
+    for name in pdf_names:
+        segment = lexical_index.segment(name)
+        if segment is not None:
+            texts.extend(segment.chunks['documents'])
+    picked = rng.sample(texts, min(count, len(texts)))
+    return [' '.join(t.split()[:12]) for t in picked]
+
+
+def ingest(indexer, pdf_paths):
+    pdf_names = []
+    pages = chunks = 0
+    start = time.perf_counter()
+    for path in pdf_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        summary = indexer.index(path, name)
+        pages += summary['pages']
+        chunks += summary['chunks']
+        pdf_names.append(name)
+    seconds = time.perf_counter() - start
+    return pdf_names, {'documents': len(pdf_paths), 'pages': pages, 'chunks': chunks, 'seconds': seconds,
+                       'pages_per_sec': pages / seconds if seconds else 0.0}
+
+
+def replay(queries, retriever, query_builder, context_builder, generator, reranker=None):
+    samples = {stage: [] for stage in STAGES}
+    for question in queries:
+        start = time.perf_counter()
+        query = query_builder.build(question)
+        t_embed = time.perf_counter()
+        hits = retriever.query(query['text'], k=RERANK_CANDIDATES if reranker else RETRIEVAL_TOP_K, embedding=query['embedding'])
+        t_retrieve = time.perf_counter()
+        if reranker:
+            hits = reranker.rerank(question, hits, RERANK_TOP_K)
+        t_rerank = time.perf_counter()
+        assembled = context_builder.build(hits)
+        prompt = f"Context from PDFs:\n{assembled['context']}\n\nUser: {question}"
+        t_prompt = time.perf_counter()
+        first_token = None
+        for _ in generator.stream(prompt):
+            if first_token is None:
+                first_token = time.perf_counter()
+        end = time.perf_counter()
+        samples['embed'].append((t_embed - start) * 1000)
+        samples['retrieve'].append((t_retrieve - t_embed) * 1000)
+        if reranker:
+            samples['rerank'].append((t_rerank - t_retrieve) * 1000)
+        samples['prompt_build'].append((t_prompt - t_rerank) * 1000)
+        samples['first_token'].append(((first_token or end) - t_prompt) * 1000)
+        samples['generate'].append((end - t_prompt) * 1000)
+        samples['total'].append((end - start) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG latency benchmark")
+    parser.add_argument('--corpus', default=DATA_DIR, help="Directory of PDFs to ingest")
+    parser.add_argument('--queries', help="Query set (.json list or one question per line); sampled from the corpus if omitted")
+    parser.add_argument('--num-queries', type=int, default=50)
+    parser.add_argument('--generator', default='echo', help="'echo' (offline) or 'gemini'")
+    parser.add_argument('--first-token-delay', type=float, default=0.0, help="Echo generator: simulated seconds to first token")
+    parser.add_argument('--token-delay', type=float, default=0.0, help="Echo generator: simulated seconds per token")
+    parser.add_argument('--rerank', action='store_true')
+    parser.add_argument('--embedding-cache', action='store_true', help="Use the persistent embedding cache")
+    parser.add_argument('--workdir', help="Scratch directory for the index (a temporary one is removed afterwards)")
+    parser.add_argument('--out', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(glob.glob(os.path.join(args.corpus, '**', '*.pdf'), recursive=True))
+    if not pdf_paths:
+        parser.error(f"No PDFs found under {args.corpus}")
+    workdir = args.workdir or tempfile.mkdtemp(prefix='unichunk_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        client = open_client(os.path.join(workdir, 'chroma_db'))
+        lexical_index = LexicalIndex(os.path.join(workdir, 'lexical_index'))
+        embedder = TextEmbedder(use_cache=args.embedding_cache)
+        indexer = DocumentIndexer(client, embedder, lexical_index, output_dir=workdir, embed_images=False)
+        pdf_names, ingest_stats = ingest(indexer, pdf_paths)
+        indexer.close()
+        print(f"Ingested {ingest_stats['documents']} PDFs, {ingest_stats['pages']} pages, {ingest_stats['chunks']} chunks "
+              f"in {ingest_stats['seconds']:.1f}s ({ingest_stats['pages_per_sec']:.1f} pages/sec)")
+
+        if args.generator == 'echo':
+            generator = EchoGenerator(first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+        else:
+            generator = build_generator(args.generator, api_key=os.environ.get("GEMINI_API_KEY", ""))
+        reranker = None
+        if args.rerank:
+            from retrieval.reranker import CrossEncoderReranker
+            reranker = CrossEncoderReranker()
+        retriever = build_retriever(client, embedder, pdf_names, lexical_index=lexical_index)
+        queries = load_queries(args.queries, lexical_index, pdf_names, args.num_queries)
+        stages = replay(queries, retriever, QueryBuilder(embedder), ContextBuilder(), generator, reranker)
+        print(f"{len(queries)} queries")
+        for stage, r in stages.items():
+            print(f"{stage:<13} p50 {r['p50_ms']:8.1f}ms  p95 {r['p95_ms']:8.1f}ms  p99 {r['p99_ms']:8.1f}ms")
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump({'ingest': ingest_stats, 'queries': len(queries), 'stages': stages}, f, indent=2)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
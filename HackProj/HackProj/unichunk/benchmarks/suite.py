@@ -0,0 +1,224 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Benchmark suite
+# Generates the synthetic corpus (digital, scanned, tables, mixed, rotated at
+# the given page counts), runs the staged pipeline per document kind, then
+# end-to-end ingestion and query replay, and records throughput, latency
+# percentiles and peak RSS as JSON. Saved results serve as a baseline: with
+# --baseline, metrics that got worse by more than --tolerance are reported and
+# the exit code is 1, so the suite can gate a change.
+
+import argparse
+import json
+import platform
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_corpus import KINDS, generate_corpus
+from ingestion.indexer import DocumentIndexer
+from utils.metrics import METRICS
+
+# Latency differences below this are timer noise, whatever the relative change
+NOISE_MS = 1.0
+
+
+def reset_peak_rss():
+    # Linux lets a process reset its high-water mark, so each phase gets its own peak
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and bytes on macOS, and never resets
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    return {f"p{q}_ms": float(np.percentile(values, q)) for q in (50, 95, 99)}
+
+
+def stage_stats():
+    # Per-stage means are exact (histogram sum / count); bucket quantiles are too coarse to compare
+    stats = {}
+    for name, labels, hist in METRICS.snapshot()['histograms']:
+        if name == 'pipeline_stage_seconds' and hist['count']:
+            stats[labels['stage']] = {'count': hist['count'], 'mean_ms': hist['sum'] / hist['count'] * 1000,
+                                      'total_seconds': hist['sum']}
+    return stats
+
+
+def bench_pipeline(indexer, paths, layout):
+    METRICS.snapshot(reset=True)
+    reset_peak_rss()
+    pages = chunks = 0
+    start = time.perf_counter()
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        for batch in indexer.iter_batches(path, name, layout=layout):
+            pages += len(batch['pages'])
+            chunks += len(batch['chunks'])
+    seconds = time.perf_counter() - start
+    page_ms = [span['seconds'] * 1000 for span in METRICS.snapshot()['spans'] if span['name'] == 'page']
+    return {
+        'documents': len(paths), 'pages': pages, 'chunks': chunks, 'seconds': seconds,
+        'pages_per_sec': pages / seconds if seconds else 0.0,
+        'page_latency': percentiles(page_ms),
+        'stages': stage_stats(),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_suite(args, workdir):
+    page_counts = [int(n) for n in args.pages.split(',')]
+    kinds = args.kinds.split(',')
+    corpus = generate_corpus(args.corpus_dir or os.path.join(workdir, 'corpus'), page_counts, kinds, args.seed)
+    from retrieval.lexical_index import LexicalIndex
+    # Every index the suite writes lives in the scratch workdir; DocumentIndexer
+    # would otherwise fall back to the real one under OUTPUT_DIR
+    lexical_index = LexicalIndex(os.path.join(workdir, 'lexical_index'))
+    embedder = None
+    if not args.no_embed:
+        from embedding.text_embedder import TextEmbedder
+        embedder = TextEmbedder(use_cache=False)
+    results = {
+        'config': {'pages': page_counts, 'kinds': kinds, 'seed': args.seed, 'embed': not args.no_embed,
+                   'layout': args.layout, 'python': platform.python_version(), 'machine': platform.machine()},
+        'pipeline': {}
+    }
+
+    # Stages, per document kind: nothing is stored, so this isolates extraction, OCR, chunking and embedding
+    indexer = DocumentIndexer(None, embedder, lexical_index, output_dir=os.path.join(workdir, 'pipeline'), embed_images=False)
+    for kind in kinds:
+        results['pipeline'][kind] = r = bench_pipeline(indexer, corpus[kind], args.layout)
+        print(f"{kind:<8} {r['pages']:4d} pages {r['pages_per_sec']:7.1f} pages/sec  "
+              f"page p95 {r['page_latency'].get('p95_ms', 0.0):8.1f}ms  peak {r['peak_rss_mb']:7.1f}MB")
+    indexer.close()
+    if args.no_embed:
+        return results
+
+    from benchmarks.rag_latency import ingest, replay, load_queries
+    from generation.context_builder import ContextBuilder
+    from generation.generators import EchoGenerator
+    from retrieval.factory import open_client, build_retriever
+    from retrieval.query_builder import QueryBuilder
+
+    # End to end: every document into a scratch index, then query replay
+    reset_peak_rss()
+    client = open_client(os.path.join(workdir, 'chroma_db'))
+    indexer = DocumentIndexer(client, embedder, lexical_index, output_dir=workdir, embed_images=False)
+    paths = [path for kind in kinds for path in corpus[kind]]
+    pdf_names, results['ingest'] = ingest(indexer, paths)
+    indexer.close()
+    results['ingest']['peak_rss_mb'] = peak_rss_mb()
+    print(f"ingest   {results['ingest']['pages']:4d} pages {results['ingest']['pages_per_sec']:7.1f} pages/sec  "
+          f"peak {results['ingest']['peak_rss_mb']:7.1f}MB")
+
+    reset_peak_rss()
+    retriever = build_retriever(client, embedder, pdf_names, lexical_index=lexical_index)
+    queries = load_queries(None, lexical_index, pdf_names, args.num_queries)
+    start = time.perf_counter()
+    stages = replay(queries, retriever, QueryBuilder(embedder), ContextBuilder(), EchoGenerator())
+    seconds = time.perf_counter() - start
+    results['query'] = {'queries': len(queries), 'queries_per_sec': len(queries) / seconds if seconds else 0.0,
+                        'stages': stages, 'peak_rss_mb': peak_rss_mb()}
+    print(f"query    {len(queries):4d} queries {results['query']['queries_per_sec']:7.1f} queries/sec  "
+          f"total p95 {stages.get('total', {}).get('p95_ms', 0.0):8.1f}ms")
+    return results
+
+
+def flatten(data, prefix=''):
+    out = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            out.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+
+def compare(results, baseline, tolerance):
+    # Returns (metric, baseline, current, relative change) for every metric
+    # that got worse by more than the tolerance; counts are not judged
+    regressions = []
+    current = flatten(results)
+    for name, before in flatten(baseline).items():
+        if name.startswith('config.') or name not in current or not before:
+            continue
+        after = current[name]
+        if name.endswith('per_sec'):
+            change = (before - after) / before
+        elif name.endswith(('_ms', '_mb', 'seconds')):
+            # Sub-millisecond stages swing by tens of percent between identical runs
+            if name.endswith('_ms') and after - before < NOISE_MS:
+                continue
+            if name.endswith('seconds') and (after - before) * 1000 < NOISE_MS:
+                continue
+            change = (after - before) / before
+        else:
+            continue
+        if change > tolerance:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic-corpus benchmark suite")
+    parser.add_argument('--pages', default='5,20', help="Comma-separated page counts per document")
+    parser.add_argument('--kinds', default=','.join(KINDS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--layout', action='store_true', help="Include the layout stage")
+    parser.add_argument('--no-embed', action='store_true', help="Pipeline stages only, without embedding, ingestion or queries")
+    parser.add_argument('--num-queries', type=int, default=50)
+    parser.add_argument('--corpus-dir', help="Keep the generated corpus here and reuse it on later runs")
+    parser.add_argument('--workdir', help="Scratch directory for the index (a temporary one is removed afterwards)")
+    parser.add_argument('--out', help="Write results as JSON to this path (e.g. to save a baseline)")
+    parser.add_argument('--baseline', help="Compare against results saved earlier with --out")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='unichunk_suite_')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        results = run_suite(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.2f} -> {after:.2f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
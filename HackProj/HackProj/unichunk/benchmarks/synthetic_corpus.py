@@ -0,0 +1,131 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Synthetic PDF corpus
+# Generates deterministic PDFs with PyMuPDF so benchmarks do not depend on
+# documents outside the repo. Kinds:
+#   digital  - text pages
+#   scanned  - text pages rasterized into full-page images (no text layer)
+#   scanned_rotated - scanned pages fed in sideways (text runs bottom to top)
+#   tables   - ruled tables with a heading paragraph
+#   mixed    - text pages with a rasterized text figure (OCR region)
+#   rotated  - digital pages with /Rotate 90
+
+import argparse
+import random
+
+import fitz
+
+KINDS = ('digital', 'scanned', 'scanned_rotated', 'tables', 'mixed', 'rotated')
+WORDS = ("device clinical evaluation conformity assessment notified body manufacturer regulation annex "
+         "classification risk software intended purpose performance safety post-market surveillance "
+         "vigilance technical documentation article requirement standard harmonised data report").split()
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+
+
+def sentence(rng, words=14):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def paragraph(rng, sentences=5):
+    return ' '.join(sentence(rng, rng.randint(8, 18)) for _ in range(sentences))
+
+
+def write_text_page(page, rng, top=60, bottom=PAGE_HEIGHT - 60):
+    y = top
+    while y < bottom - 80:
+        text = paragraph(rng, rng.randint(2, 5))
+        rect = fitz.Rect(60, y, PAGE_WIDTH - 60, bottom)
+        used = page.insert_textbox(rect, text, fontsize=10, fontname='helv')
+        # insert_textbox returns the unused height; stop once the page is full
+        if used < 0:
+            break
+        y = bottom - used + 14
+
+
+def text_image(rng, width=400, height=160, zoom=2):
+    # A rasterized paragraph, as produced by a scanner
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.insert_textbox(fitz.Rect(10, 10, width - 10, height - 10), paragraph(rng, 3), fontsize=11, fontname='helv')
+    png = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png')
+    doc.close()
+    return png
+
+
+def add_page(doc, kind, rng):
+    if kind in ('scanned', 'scanned_rotated'):
+        source = fitz.open()
+        write_text_page(source.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT), rng)
+        if kind == 'scanned_rotated':
+            # Rendering a /Rotate 270 page gives the sideways raster
+            source[0].set_rotation(270)
+        png = source[0].get_pixmap(dpi=150, colorspace=fitz.csGRAY).tobytes('png')
+        width, height = source[0].rect.width, source[0].rect.height
+        source.close()
+        page = doc.new_page(width=width, height=height)
+        page.insert_image(page.rect, stream=png)
+        return
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    if kind == 'tables':
+        page.insert_textbox(fitz.Rect(60, 50, PAGE_WIDTH - 60, 130), paragraph(rng, 2), fontsize=10, fontname='helv')
+        rows, cols = rng.randint(6, 14), rng.randint(3, 6)
+        x0, y0, cell_w, cell_h = 60, 150, (PAGE_WIDTH - 120) / cols, 22
+        for r in range(rows + 1):
+            page.draw_line((x0, y0 + r * cell_h), (x0 + cols * cell_w, y0 + r * cell_h))
+        for c in range(cols + 1):
+            page.draw_line((x0 + c * cell_w, y0), (x0 + c * cell_w, y0 + rows * cell_h))
+        for r in range(rows):
+            for c in range(cols):
+                text = rng.choice(WORDS) if r == 0 else f"{rng.randint(0, 9999)}" if c else rng.choice(WORDS)
+                page.insert_text((x0 + c * cell_w + 4, y0 + r * cell_h + 15), text, fontsize=9, fontname='helv')
+        return
+    if kind == 'mixed':
+        write_text_page(page, rng, bottom=PAGE_HEIGHT - 260)
+        page.insert_image(fitz.Rect(90, PAGE_HEIGHT - 240, PAGE_WIDTH - 90, PAGE_HEIGHT - 60), stream=text_image(rng))
+        return
+    write_text_page(page, rng)
+    if kind == 'rotated':
+        page.set_rotation(90)
+
+
+def make_pdf(path, kind, pages, seed=0):
+    rng = random.Random(f"{kind}:{pages}:{seed}")
+    doc = fitz.open()
+    for _ in range(pages):
+        add_page(doc, kind, rng)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def generate_corpus(out_dir, page_counts=(5,), kinds=KINDS, seed=0):
+    # Returns {kind: [paths]}; existing files are reused, since generation is
+    # deterministic for a kind, page count and seed (all in the file name)
+    os.makedirs(out_dir, exist_ok=True)
+    corpus = {}
+    for kind in kinds:
+        for pages in page_counts:
+            path = os.path.join(out_dir, f"synthetic_{kind}_{pages}p_s{seed}.pdf")
+            if not os.path.exists(path):
+                make_pdf(path, kind, pages, seed)
+            corpus.setdefault(kind, []).append(path)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PDF corpus")
+    parser.add_argument('out_dir')
+    parser.add_argument('--pages', default='5', help="Comma-separated page counts per document")
+    parser.add_argument('--kinds', default=','.join(KINDS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    corpus = generate_corpus(args.out_dir, [int(n) for n in args.pages.split(',')], args.kinds.split(','), args.seed)
+    for kind, paths in corpus.items():
+        for path in paths:
+            print(f"{kind:<8} {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Table screening benchmark
+# Times table extraction per page two ways: pdfplumber's extract_tables() on
+# every page (the old behaviour), and the PyMuPDF drawing pre-screen with
+# extraction only on candidate pages (parser/table_extractor.py). Also checks
+# that screening finds the same tables. Runs on the synthetic corpus unless
+# PDFs are given.
+
+import argparse
+import glob
+import json
+import shutil
+import tempfile
+import time
+
+import fitz
+import numpy as np
+import pdfplumber
+
+from benchmarks.synthetic_corpus import generate_corpus
+from parser.table_extractor import TableExtractor, fitz_rule_counts, is_candidate, compact_rows
+
+
+def unconditional(pdf_path):
+    # (seconds, tables) per page
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            start = time.perf_counter()
+            tables = [rows for rows in map(compact_rows, page.extract_tables()) if rows]
+            results.append((time.perf_counter() - start, len(tables)))
+            page.close()
+    return results
+
+
+def screened(pdf_path):
+    # (seconds, tables, candidate) per page
+    results = []
+    doc = fitz.open(pdf_path)
+    extractor = TableExtractor(pdf_path)
+    try:
+        for page_index, page in enumerate(doc):
+            start = time.perf_counter()
+            candidate = is_candidate(fitz_rule_counts(page))
+            tables = extractor.extract(page_index) if candidate else []
+            results.append((time.perf_counter() - start, len(tables), candidate))
+    finally:
+        extractor.close()
+        doc.close()
+    return results
+
+
+def compare(pdf_path):
+    before, after = unconditional(pdf_path), screened(pdf_path)
+    return {
+        'pages': len(before),
+        'unconditional_ms': [s * 1000 for s, _ in before],
+        'screened_ms': [s * 1000 for s, _, _ in after],
+        'tables_unconditional': sum(n for _, n in before),
+        'tables_screened': sum(n for _, n, _ in after),
+        'candidates': sum(1 for _, _, candidate in after if candidate)
+    }
+
+
+def run(paths, per_page):
+    results = {}
+    for path in paths:
+        name = os.path.basename(path)
+        results[name] = r = compare(path)
+        if per_page:
+            for page_no, (u, s) in enumerate(zip(r['unconditional_ms'], r['screened_ms']), start=1):
+                print(f"{name} p{page_no:<4} unconditional {u:8.2f}ms  screened {s:8.2f}ms")
+        u, s = np.mean(r['unconditional_ms']), np.mean(r['screened_ms'])
+        print(f"{name:<32} {r['pages']:4d} pages ({r['candidates']} candidates)  unconditional {u:7.2f}ms/page  screened {s:7.2f}ms/page  "
+              f"x{u / s if s else float('inf'):.1f}  tables {r['tables_unconditional']} -> {r['tables_screened']}")
+        if r['tables_screened'] != r['tables_unconditional']:
+            print(f"  warning: screening changed the tables found in {name}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Table pre-screening vs unconditional extraction, per page")
+    parser.add_argument('pdfs', nargs='*', help="PDFs or directories (default: a synthetic corpus)")
+    parser.add_argument('--pages', type=int, default=20, help="Pages per synthetic document")
+    parser.add_argument('--per-page', action='store_true', help="Print every page's timings")
+    parser.add_argument('--out', help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.pdfs:
+        paths += sorted(glob.glob(os.path.join(path, '**', '*.pdf'), recursive=True)) if os.path.isdir(path) else [path]
+    workdir = None
+    if not args.pdfs:
+        workdir = tempfile.mkdtemp(prefix='unichunk_tables_')
+        corpus = generate_corpus(workdir, (args.pages,), ('digital', 'tables', 'mixed', 'rotated'))
+        paths = [p for kind_paths in corpus.values() for p in kind_paths]
+
+    try:
+        results = run(paths, args.per_page)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Text Chunker
+# Splits page text into paragraph-aligned chunks of about chunk_size characters;
+# each chunk starts with the last `overlap` characters of the previous one
+import re
+
+from utils.config import CHUNK_SIZE, CHUNK_OVERLAP
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    paragraphs = [p for p in text.split('\n') if p.strip()]
+    chunks = []
+    current = ""
+    for p in paragraphs:
+        if len(current) + len(p) < chunk_size:
+            current += p + "\n"
+        else:
+            chunks.append(current.strip())
+            current = p + "\n"
+    if current.strip():
+        chunks.append(current.strip())
+    final_chunks = []
+    for i, chunk in enumerate(chunks):
+        prev = chunks[i-1][-overlap:] if i > 0 else ""
+        final_chunks.append(prev + chunk)
+    return final_chunks
+
+
+def chunk_ranges(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    # (start, end) offsets in `text` of each chunk chunk_text returns, including
+    # the overlap taken from the previous chunk; used to map chunks to page boxes
+    groups = []
+    current_len, start, end = 0, None, None
+    for m in re.finditer(r'[^\n]+', text):
+        if not m.group().strip():
+            continue
+        if current_len + len(m.group()) < chunk_size:
+            current_len += len(m.group()) + 1
+            start = m.start() if start is None else start
+        else:
+            groups.append((start, end))
+            current_len, start = len(m.group()) + 1, m.start()
+        end = m.end()
+    if start is not None:
+        groups.append((start, end))
+    ranges = []
+    for i, (start, end) in enumerate(groups):
+        # An empty first group mirrors the empty chunk chunk_text emits when the
+        # first paragraph alone exceeds chunk_size
+        if start is None:
+            ranges.append((0, 0))
+            continue
+        prev_start, prev_end = groups[i - 1] if i > 0 else (None, None)
+        # The overlap never reaches past the previous chunk, however short it is
+        ranges.append((max(prev_end - overlap, prev_start) if prev_end is not None else start, end))
+    return ranges
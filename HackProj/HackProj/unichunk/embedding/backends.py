@@ -0,0 +1,182 @@
+# Embedding Backends
+# CPU inference backends for the text and image embedders:
+#   torch       full-precision PyTorch (reference)
+#   torch-int8  PyTorch with dynamic int8 quantization of Linear layers
+#   onnx        ONNX Runtime on an exported graph
+#   onnx-int8   ONNX Runtime on a dynamically int8-quantized graph
+import os
+
+import numpy as np
+import torch
+
+from utils.config import ONNX_CACHE_DIR, ONNX_THREADS
+
+TEXT_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+IMAGE_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+
+def _onnx_paths(model_name, quantized):
+    model_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace('/', '__'))
+    os.makedirs(model_dir, exist_ok=True)
+    fp32_path = os.path.join(model_dir, 'model.onnx')
+    return fp32_path, os.path.join(model_dir, 'model.int8.onnx') if quantized else fp32_path
+
+
+def _quantize_onnx(fp32_path, int8_path):
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+
+
+def _onnx_session(path):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if ONNX_THREADS:
+        options.intra_op_num_threads = ONNX_THREADS
+    return ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+
+class TorchTextBackend:
+    def __init__(self, model_name, quantized=False):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.model.eval()
+        if quantized:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32):
+        with torch.inference_mode():
+            vectors = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OnnxTextBackend:
+    def __init__(self, model_name, quantized=False):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.dim = self.model.get_sentence_embedding_dimension()
+        module_names = [type(m).__name__ for m in self.model]
+        self.normalize = 'Normalize' in module_names
+        pooling = self.model[1] if len(self.model) > 1 else None
+        self.cls_pooling = bool(getattr(pooling, 'pooling_mode_cls_token', False))
+        fp32_path, path = _onnx_paths(model_name, quantized)
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+        if quantized:
+            _quantize_onnx(fp32_path, path)
+        self.session = _onnx_session(path)
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _export(self, path):
+        auto_model = self.model[0].auto_model
+        dummy = self.tokenizer(["export sample"], return_tensors='pt')
+        input_names = [n for n in ('input_ids', 'attention_mask', 'token_type_ids') if n in dummy]
+        dynamic_axes = {n: {0: 'batch', 1: 'sequence'} for n in input_names}
+        dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+        with torch.no_grad():
+            torch.onnx.export(
+                auto_model, tuple(dummy[n] for n in input_names), path,
+                input_names=input_names, output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes, opset_version=14
+            )
+
+    def encode(self, texts, batch_size=32):
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors='np')
+            feeds = {n: tokens[n].astype(np.int64) for n in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            if self.cls_pooling:
+                pooled = hidden[:, 0]
+            else:
+                mask = tokens['attention_mask'][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        if not batches:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack(batches)
+
+
+class TorchImageBackend:
+    def __init__(self, model_name, quantized=False):
+        from transformers import CLIPModel
+        self.model_name = model_name
+        self.model = CLIPModel.from_pretrained(model_name)
+        self.model.eval()
+        if quantized:
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.dim = self.model.config.projection_dim
+
+    def encode_pixels(self, pixel_values):
+        with torch.inference_mode():
+            embeddings = self.model.get_image_features(pixel_values=pixel_values)
+        return embeddings.cpu().numpy().astype(np.float32)
+
+
+class _ImageFeatures(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values):
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+
+class OnnxImageBackend:
+    def __init__(self, model_name, quantized=False):
+        from transformers import CLIPConfig
+        self.model_name = model_name
+        self.model = None
+        self.dim = CLIPConfig.from_pretrained(model_name).projection_dim
+        fp32_path, path = _onnx_paths(model_name, quantized)
+        if not os.path.exists(fp32_path):
+            self._export(fp32_path)
+        if quantized:
+            _quantize_onnx(fp32_path, path)
+        self.session = _onnx_session(path)
+
+    def _export(self, path):
+        from transformers import CLIPModel
+        model = CLIPModel.from_pretrained(self.model_name)
+        model.eval()
+        size = model.config.vision_config.image_size
+        dummy = torch.zeros(1, 3, size, size)
+        with torch.no_grad():
+            torch.onnx.export(
+                _ImageFeatures(model), (dummy,), path,
+                input_names=['pixel_values'], output_names=['image_embeds'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'image_embeds': {0: 'batch'}},
+                opset_version=14
+            )
+
+    def encode_pixels(self, pixel_values):
+        if isinstance(pixel_values, torch.Tensor):
+            pixel_values = pixel_values.numpy()
+        return self.session.run(None, {'pixel_values': pixel_values.astype(np.float32)})[0].astype(np.float32)
+
+
+def build_text_backend(name, model_name):
+    if name not in TEXT_BACKENDS:
+        raise ValueError(f"Unknown text embedding backend '{name}', expected one of {TEXT_BACKENDS}")
+    if name.startswith('onnx'):
+        return OnnxTextBackend(model_name, quantized=name.endswith('int8'))
+    return TorchTextBackend(model_name, quantized=name.endswith('int8'))
+
+
+def build_image_backend(name, model_name):
+    if name not in IMAGE_BACKENDS:
+        raise ValueError(f"Unknown image embedding backend '{name}', expected one of {IMAGE_BACKENDS}")
+    if name.startswith('onnx'):
+        return OnnxImageBackend(model_name, quantized=name.endswith('int8'))
+    return TorchImageBackend(model_name, quantized=name.endswith('int8'))
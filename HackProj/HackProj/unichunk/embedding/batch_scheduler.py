@@ -0,0 +1,104 @@
+# Embedding Batch Scheduler
+# Sorts texts by token length and packs them into buckets under a padded-token
+# budget, so short headings are not padded up to the longest chunk in a batch.
+# Buckets can be encoded in worker processes; results come back in input order.
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.config import EMBED_TOKEN_BUDGET, EMBED_MAX_BATCH_SIZE, EMBED_PROCESSES
+
+_worker_backend = None
+
+
+def _init_worker(backend_name, model_name, threads):
+    global _worker_backend
+    import torch
+    from embedding.backends import build_text_backend
+    torch.set_num_threads(threads)
+    _worker_backend = build_text_backend(backend_name, model_name)
+
+
+def _encode_in_worker(texts):
+    return _worker_backend.encode(texts, batch_size=len(texts))
+
+
+def padded_tokens(lengths, batch_size):
+    return sum(max(lengths[i:i + batch_size]) * len(lengths[i:i + batch_size]) for i in range(0, len(lengths), batch_size))
+
+
+class EmbeddingScheduler:
+    def __init__(self, backend, backend_name=None, token_budget=EMBED_TOKEN_BUDGET,
+                 max_batch_size=EMBED_MAX_BATCH_SIZE, processes=EMBED_PROCESSES):
+        self.backend = backend
+        self.backend_name = backend_name
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.processes = processes
+        self._pool = None
+        self.stats = {'texts': 0, 'tokens': 0, 'padded_tokens': 0, 'naive_padded_tokens': 0, 'seconds': 0.0}
+
+    def token_lengths(self, texts):
+        encoded = self.backend.tokenizer(texts, truncation=True, max_length=self.backend.max_seq_length)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def buckets(self, lengths):
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        buckets = []
+        current = []
+        for i in order:
+            # Sorted ascending, so the padded width of the bucket is the current length
+            if current and ((len(current) + 1) * lengths[i] > self.token_budget or len(current) >= self.max_batch_size):
+                buckets.append(current)
+                current = []
+            current.append(i)
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def _get_pool(self):
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.processes)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.backend_name, self.backend.model_name, threads)
+            )
+        return self._pool
+
+    def encode(self, texts):
+        if not texts:
+            return np.zeros((0, self.backend.dim), dtype=np.float32)
+        start = time.perf_counter()
+        lengths = self.token_lengths(texts)
+        buckets = self.buckets(lengths)
+        batches = [[texts[i] for i in bucket] for bucket in buckets]
+        if self.processes > 1 and self.backend_name and len(batches) > 1:
+            results = list(self._get_pool().map(_encode_in_worker, batches))
+        else:
+            results = [self.backend.encode(batch, batch_size=len(batch)) for batch in batches]
+        out = np.zeros((len(texts), self.backend.dim), dtype=np.float32)
+        for bucket, vectors in zip(buckets, results):
+            out[bucket] = vectors
+        self.stats['texts'] += len(texts)
+        self.stats['tokens'] += sum(lengths)
+        self.stats['padded_tokens'] += sum(max(lengths[i] for i in bucket) * len(bucket) for bucket in buckets)
+        self.stats['naive_padded_tokens'] += padded_tokens(lengths, 32)
+        self.stats['seconds'] += time.perf_counter() - start
+        return out
+
+    def report(self):
+        stats = dict(self.stats)
+        stats['tokens_per_sec'] = stats['tokens'] / stats['seconds'] if stats['seconds'] else 0.0
+        stats['padding_efficiency'] = stats['tokens'] / stats['padded_tokens'] if stats['padded_tokens'] else 1.0
+        stats['naive_padding_efficiency'] = stats['tokens'] / stats['naive_padded_tokens'] if stats['naive_padded_tokens'] else 1.0
+        return stats
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
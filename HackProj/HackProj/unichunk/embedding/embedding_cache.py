@@ -0,0 +1,242 @@
+# Embedding Cache
+# Persistent text -> vector cache keyed by a hash of the normalized text and the
+# model/backend that produced it. Vectors live in a fixed-size float32 memmap,
+# the key -> slot index in SQLite, and the least recently used slot is reused
+# once the cache is full. One process writes; ingest workers open the cache
+# read-only and hand the vectors they compute to that process (take_updates /
+# store_many). Each slot also records the key it holds, so a reader never
+# takes a vector from a slot the writer has just reused for another text.
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from urllib.request import pathname2url
+
+import numpy as np
+
+from utils.config import EMBED_CACHE_DIR, EMBED_CACHE_CAPACITY
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def _digest(key):
+    return np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+
+
+def shared_cache(model_key, dim, cache_dir=EMBED_CACHE_DIR, capacity=EMBED_CACHE_CAPACITY):
+    # The writable cache for a directory and model, one per process, so the
+    # query embedder and the ingest writer never hand out the same free slot
+    key = (os.path.abspath(cache_dir), model_key)
+    with _shared_lock:
+        cache = _shared.get(key)
+        if cache is None:
+            cache = _shared[key] = EmbeddingCache(model_key, dim, cache_dir, capacity)
+        return cache
+
+
+class EmbeddingCache:
+    def __init__(self, model_key, dim, cache_dir=EMBED_CACHE_DIR, capacity=EMBED_CACHE_CAPACITY, read_only=False):
+        self.model_key = model_key
+        self.dim = dim
+        self.capacity = capacity
+        self.read_only = read_only
+        self.dir = os.path.join(cache_dir, re.sub(r'[^a-zA-Z0-9._-]', '_', model_key))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if read_only:
+            # Attached on first lookup, since the writer may not have created the files yet
+            self._db = None
+            self._updates = {}
+            self._used = set()
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.dir, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER, tick INTEGER)")
+        vectors_path, digests_path = os.path.join(self.dir, 'vectors.f32'), os.path.join(self.dir, 'keys.u8')
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        if (meta.get('dim') != str(dim) or meta.get('capacity') != str(capacity)
+                or not os.path.exists(vectors_path) or not os.path.exists(digests_path)):
+            self._db.execute("DELETE FROM entries")
+            self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [('dim', str(dim)), ('capacity', str(capacity))])
+            self._db.commit()
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode='w+', shape=(capacity, dim))
+            self.digests = np.memmap(digests_path, dtype=np.uint8, mode='w+', shape=(capacity, 20))
+        else:
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode='r+', shape=(capacity, dim))
+            self.digests = np.memmap(digests_path, dtype=np.uint8, mode='r+', shape=(capacity, 20))
+        # key -> slot, least recently used first
+        self._slots = OrderedDict(self._db.execute("SELECT key, slot FROM entries ORDER BY tick"))
+        self._free = sorted(set(range(capacity)) - set(self._slots.values()), reverse=True)
+        # Continue the stored clock, so entries touched from now on sort after older ones
+        self._tick = self._db.execute("SELECT COALESCE(MAX(tick), 0) FROM entries").fetchone()[0]
+        self._touched = {}
+        self._evicted = []
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.model_key}\0{normalize_text(text)}".encode('utf-8')).hexdigest()
+
+    # --- read-only ---
+
+    def _attach(self):
+        if self._db is not None:
+            return True
+        paths = [os.path.join(self.dir, name) for name in ('index.sqlite', 'vectors.f32', 'keys.u8')]
+        if not all(os.path.exists(path) for path in paths):
+            return False
+        db = sqlite3.connect(f"file:{pathname2url(paths[0])}?mode=ro", uri=True, check_same_thread=False)
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        if meta.get('dim') != str(self.dim) or meta.get('capacity') != str(self.capacity):
+            db.close()
+            return False
+        self.vectors = np.memmap(paths[1], dtype=np.float32, mode='r', shape=(self.capacity, self.dim))
+        self.digests = np.memmap(paths[2], dtype=np.uint8, mode='r', shape=(self.capacity, 20))
+        self._db = db
+        return True
+
+    def _read_shared(self, keys):
+        # Vectors the writer has committed for these keys. The slot is checked
+        # to still hold the key before and after the copy, so a slot reused
+        # since (or mid-copy) counts as a miss
+        try:
+            if not self._attach():
+                return {}
+            slots = {}
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                slots.update(self._db.execute(f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(part))})", part))
+        except sqlite3.Error:
+            # e.g. the writer holds the database longer than the busy timeout
+            return {}
+        found = {}
+        for key, slot in slots.items():
+            digest = _digest(key)
+            if not np.array_equal(self.digests[slot], digest):
+                continue
+            vector = np.array(self.vectors[slot])
+            if np.array_equal(self.digests[slot], digest):
+                found[key] = vector
+        return found
+
+    def take_updates(self):
+        # Vectors computed since the last call and the keys that were hits,
+        # for the writer's store_many and touch
+        with self._lock:
+            if not self._updates and not self._used:
+                return None
+            updates = {'keys': list(self._updates), 'vectors': [v.tolist() for v in self._updates.values()], 'used': sorted(self._used)}
+            self._updates, self._used = {}, set()
+        return updates
+
+    # --- lookups and writes ---
+
+    def get_many(self, texts):
+        # Returns a list aligned with texts holding a vector or None
+        if self.read_only:
+            keys = [self.key(text) for text in texts]
+            with self._lock:
+                found = dict(self._updates)
+                found.update(self._read_shared([k for k in dict.fromkeys(keys) if k not in found]))
+                out = [found.get(key) for key in keys]
+                self._used.update(key for key in keys if key in found and key not in self._updates)
+                self.hits += sum(v is not None for v in out)
+                self.misses += sum(v is None for v in out)
+            return [None if v is None else np.array(v) for v in out]
+        out = []
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self.hits += 1
+                self._slots.move_to_end(key)
+                self._tick += 1
+                self._touched[key] = (slot, self._tick)
+                out.append(np.array(self.vectors[slot]))
+        return out
+
+    def put_many(self, texts, vectors):
+        if self.read_only:
+            # Held for the writer; take_updates hands them over
+            with self._lock:
+                for text, vector in zip(texts, vectors):
+                    self._updates[self.key(text)] = np.asarray(vector, dtype=np.float32)
+            return
+        self.store_many([self.key(text) for text in texts], vectors)
+
+    def store_many(self, keys, vectors):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        old_key, slot = self._slots.popitem(last=False)
+                        self._touched.pop(old_key, None)
+                        self._evicted.append(old_key)
+                        self.evictions += 1
+                    self._slots[key] = slot
+                else:
+                    self._slots.move_to_end(key)
+                # Cleared while the vector changes, for readers in other processes
+                self.digests[slot] = 0
+                self.vectors[slot] = vector
+                self.digests[slot] = _digest(key)
+                self._tick += 1
+                self._touched[key] = (slot, self._tick)
+
+    def touch(self, keys):
+        # Marks entries as used, e.g. hits reported by read-only workers
+        with self._lock:
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is not None:
+                    self._slots.move_to_end(key)
+                    self._tick += 1
+                    self._touched[key] = (slot, self._tick)
+
+    def flush(self):
+        if self.read_only:
+            return
+        with self._lock:
+            if not self._touched and not self._evicted:
+                return
+            self.vectors.flush()
+            self.digests.flush()
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in self._evicted])
+            self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                                 [(k, slot, tick) for k, (slot, tick) in self._touched.items()])
+            self._db.commit()
+            self._touched = {}
+            self._evicted = []
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': None if self.read_only else len(self._slots),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
@@ -1,15 +1,31 @@
 # Image Embedder using CLIP (ViT-B/32)
-from transformers import CLIPProcessor, CLIPModel
+from transformers import CLIPProcessor
 from PIL import Image
-import torch
+import numpy as np
+
+from embedding.backends import build_image_backend
+from utils.config import IMAGE_EMBED_MODEL, IMAGE_EMBED_BACKEND
 
 class ImageEmbedder:
-    def __init__(self, model_name='openai/clip-vit-base-patch32'):
-        self.model = CLIPModel.from_pretrained(model_name)
+    def __init__(self, model_name=IMAGE_EMBED_MODEL, batch_size=16, backend=IMAGE_EMBED_BACKEND):
+        self.model_name = model_name
+        self.backend_name = backend
+        self.backend = build_image_backend(backend, model_name)
+        self.model = self.backend.model
         self.processor = CLIPProcessor.from_pretrained(model_name)
+        self.batch_size = batch_size
+
+    def preprocess(self, images):
+        return self.processor(images=images, return_tensors="pt")['pixel_values']
+
+    def embed_pixels(self, pixel_values):
+        return self.backend.encode_pixels(pixel_values)
 
     def embed(self, images):
-        inputs = self.processor(images=images, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            embeddings = self.model.get_image_features(**inputs)
-        return embeddings.cpu().numpy()
+        batches = []
+        for start in range(0, len(images), self.batch_size):
+            batch = images[start:start + self.batch_size]
+            batches.append(self.embed_pixels(self.preprocess(batch)))
+        if not batches:
+            return np.zeros((0, self.backend.dim), dtype=np.float32)
+        return np.vstack(batches)
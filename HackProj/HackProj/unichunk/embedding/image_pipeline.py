@@ -0,0 +1,70 @@
+# Image Embedding Pipeline
+# Decodes, resizes and preprocesses extracted images on a worker pool while
+# CLIP runs on fixed-size batches, DataLoader style
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils.config import IMAGE_EMBED_BATCH_SIZE, IMAGE_DECODE_WORKERS, IMAGE_SIZE
+
+
+def load_image(path, size=IMAGE_SIZE):
+    try:
+        image = Image.open(path)
+        # JPEG can decode straight at a reduced scale
+        image.draft('RGB', (size, size))
+        image = image.convert('RGB')
+    except Exception:
+        return None
+    scale = size / min(image.size)
+    if scale < 1:
+        image = image.resize((max(size, round(image.width * scale)), max(size, round(image.height * scale))), Image.BICUBIC)
+    return image
+
+
+class ImageEmbeddingPipeline:
+    def __init__(self, embedder, batch_size=IMAGE_EMBED_BATCH_SIZE, num_workers=IMAGE_DECODE_WORKERS, prefetch=2):
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.stats = {'images': 0, 'failed': 0, 'seconds': 0.0, 'images_per_sec': 0.0}
+
+    def _prepare_batch(self, paths):
+        # Worker side: decode + resize + CLIP preprocessing, i.e. load and collate
+        loaded = [(path, load_image(path)) for path in paths]
+        ok = [(path, image) for path, image in loaded if image is not None]
+        if not ok:
+            return [], None, len(paths)
+        pixel_values = self.embedder.preprocess([image for _, image in ok])
+        return [path for path, _ in ok], pixel_values, len(paths) - len(ok)
+
+    def run(self, image_paths):
+        start = time.perf_counter()
+        batches = [image_paths[i:i + self.batch_size] for i in range(0, len(image_paths), self.batch_size)]
+        out_paths = []
+        vectors = []
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            futures = [pool.submit(self._prepare_batch, b) for b in batches[:self.prefetch + 1]]
+            next_batch = len(futures)
+            for i in range(len(batches)):
+                paths, pixel_values, failed = futures[i].result()
+                futures[i] = None
+                if next_batch < len(batches):
+                    futures.append(pool.submit(self._prepare_batch, batches[next_batch]))
+                    next_batch += 1
+                self.stats['failed'] += failed
+                if pixel_values is None:
+                    continue
+                vectors.append(self.embedder.embed_pixels(pixel_values))
+                out_paths.extend(paths)
+        elapsed = time.perf_counter() - start
+        self.stats['images'] += len(out_paths)
+        self.stats['seconds'] += elapsed
+        if self.stats['seconds'] > 0:
+            self.stats['images_per_sec'] = self.stats['images'] / self.stats['seconds']
+        if not vectors:
+            return out_paths, np.zeros((0, 0), dtype=np.float32)
+        return out_paths, np.vstack(vectors)
@@ -1,9 +1,65 @@
 # Text Embedder using Sentence Transformers
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from embedding.backends import build_text_backend
+from embedding.batch_scheduler import EmbeddingScheduler
+from embedding.embedding_cache import EmbeddingCache, shared_cache
+from utils.config import TEXT_EMBED_MODEL, TEXT_EMBED_BACKEND, EMBED_CACHE_ENABLED, EMBED_CACHE_DIR
+from utils.metrics import METRICS
 
 class TextEmbedder:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name=TEXT_EMBED_MODEL, backend=TEXT_EMBED_BACKEND, use_cache=EMBED_CACHE_ENABLED,
+                 cache_dir=EMBED_CACHE_DIR, cache_read_only=False):
+        self.model_name = model_name
+        self.backend_name = backend
+        self.backend = build_text_backend(backend, model_name)
+        self.model = self.backend.model
+        self.scheduler = EmbeddingScheduler(self.backend, backend_name=backend)
+        self.cache = None
+        if use_cache and cache_read_only:
+            # Ingest workers: lookups only, new vectors go back to the writer with each batch
+            self.cache = EmbeddingCache(self.cache_key, self.backend.dim, cache_dir, read_only=True)
+        elif use_cache:
+            self.cache = shared_cache(self.cache_key, self.backend.dim, cache_dir)
+
+    @property
+    def cache_key(self):
+        return f"{self.model_name}@{self.backend_name}"
+
+    def cache_updates(self):
+        # Vectors a read-only cache could not store itself, for the writer process
+        if self.cache is None or not self.cache.read_only:
+            return None
+        updates = self.cache.take_updates()
+        if updates is not None:
+            updates.update(model_key=self.cache_key, dim=self.backend.dim)
+        return updates
 
+    @METRICS.timed('embed')
     def embed(self, texts):
-        return self.model.encode(texts)
+        texts = list(texts)
+        if self.cache is None:
+            METRICS.inc('chunks_embedded_total', len(texts))
+            return self.scheduler.encode(texts)
+        vectors = self.cache.get_many(texts)
+        # Encode each distinct missing text once, even if it repeats within the batch
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        METRICS.inc('embedding_cache_hits_total', len(texts) - sum(v is None for v in vectors))
+        METRICS.inc('chunks_embedded_total', len(missing))
+        if missing:
+            encoded = dict(zip(missing, self.scheduler.encode(missing)))
+            self.cache.put_many(missing, [encoded[t] for t in missing])
+            self.cache.flush()
+            vectors = [encoded[t] if v is None else v for t, v in zip(texts, vectors)]
+        if not vectors:
+            return np.zeros((0, self.backend.dim), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32)
+
+
+class TextEmbeddingFunction:
+    # Chroma embedding function backed by a TextEmbedder, so collections use the configured backend
+    def __init__(self, embedder):
+        self.embedder = embedder
+
+    def __call__(self, input):
+        return self.embedder.embed(input).tolist()
@@ -1,10 +1,6 @@
 import os
 import sys
-import re
 import traceback
-import tempfile
-import json
-import uuid
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -28,32 +24,100 @@ st.sidebar.header("Upload & Process PDF")
 uploaded_files = st.sidebar.file_uploader("Choose PDF file(s)", type=["pdf"], accept_multiple_files=True)
 
 # --- UTILS ---
-def sanitize_collection_name(name):
-    name = re.sub(r'[^a-zA-Z0-9._-]', '_', name)
-    name = name.strip('_-.')
-    if len(name) < 3:
-        name = (name + '_db')[:3]
-    if len(name) > 512:
-        name = name[:512]
-    return name
-
-def chunk_text(text, chunk_size=1000, overlap=100):
-    paragraphs = [p for p in text.split('\n') if p.strip()]
-    chunks = []
-    current = ""
-    for p in paragraphs:
-        if len(current) + len(p) < chunk_size:
-            current += p + "\n"
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.naming import sanitize_collection_name
+
+@st.cache_resource
+def get_text_embedder():
+    from embedding.text_embedder import TextEmbedder
+    return TextEmbedder()
+
+@st.cache_resource
+def get_lexical_index():
+    from retrieval.lexical_index import LexicalIndex
+    return LexicalIndex()
+
+def get_retriever(client, collection_names):
+    from retrieval.factory import build_retriever
+    return build_retriever(client, get_text_embedder(), collection_names, lexical_index=get_lexical_index())
+
+@st.cache_resource
+def get_reranker():
+    from retrieval.reranker import CrossEncoderReranker
+    return CrossEncoderReranker()
+
+@st.cache_resource
+def get_query_cache():
+    from retrieval.query_cache import QueryCache
+    return QueryCache()
+
+def show_sources(metadatas):
+    if metadatas:
+        sources = [f"{pdf_name_map.get(meta.get('pdf_name', ''), meta.get('pdf_name', '?'))} p.{meta.get('page_no', '?')}" for meta in metadatas]
+        st.caption("Sources: " + " · ".join(sources))
+
+@st.cache_resource
+def start_metrics_endpoint(port):
+    from utils.metrics import METRICS
+    return METRICS.serve(port)
+
+@st.cache_resource
+def get_preview_cache():
+    from utils.preview_cache import PreviewCache
+    return PreviewCache()
+
+@st.cache_resource
+def get_client(persist_directory):
+    from retrieval.factory import open_client
+    return open_client(persist_directory)
+
+@st.cache_resource
+def get_ingest_service(persist_directory):
+    # One background writer per app server; the heavy work runs in its worker processes
+    from ingestion.batch_ingest import IngestService
+    return IngestService(get_client(persist_directory), get_lexical_index())
+
+from utils.config import INGEST_POLL_SECONDS, METRICS_PORT
+if METRICS_PORT:
+    start_metrics_endpoint(METRICS_PORT)
+# Reruns only the progress panel while jobs run, so chat input is not replayed
+poll_fragment = st.fragment(run_every=INGEST_POLL_SECONDS) if hasattr(st, 'fragment') else (lambda fn: fn)
+
+@poll_fragment
+def show_ingest_progress(paths, output_dir):
+    from ingestion.job_ledger import JobLedger
+    ledger = JobLedger()
+    jobs = ledger.jobs(paths)
+    ledger.close()
+    for job in jobs:
+        label = pdf_name_map.get(job['pdf_name'], job['pdf_name'])
+        if job['status'] == 'done':
+            st.progress(1.0, text=f"{label}: {job['pages_total']} pages, {job['chunks']} chunks indexed")
+            json_path = os.path.join(output_dir, f"{job['pdf_name']}.json")
+            if os.path.exists(json_path):
+                with open(json_path, "rb") as f:
+                    st.download_button(f"Download JSON for {label}", f, file_name=f"{job['pdf_name']}.json", mime="application/json", key=f"json_{job['pdf_name']}")
+        elif job['status'] == 'failed':
+            st.error(f"{label}: ingestion failed: {job['error']}")
         else:
-            chunks.append(current.strip())
-            current = p + "\n"
-    if current.strip():
-        chunks.append(current.strip())
-    final_chunks = []
-    for i, chunk in enumerate(chunks):
-        prev = chunks[i-1][-overlap:] if i > 0 else ""
-        final_chunks.append(prev + chunk)
-    return final_chunks
+            total = job['pages_total']
+            st.progress(job['pages_done'] / total if total else 0.0,
+                        text=f"{label}: {job['status']}, page {job['pages_done']}/{total or '?'}")
+    if any(job['status'] in ('pending', 'running') for job in jobs):
+        st.caption("Questions are answered from the pages indexed so far.")
+        service = get_ingest_service(os.path.join(output_dir, "chroma_db"))
+        if service.error:
+            st.error(f"Ingestion service stopped: {service.error}")
+
+def show_embedding_stats():
+    embedder = get_text_embedder()
+    if embedder.cache is not None:
+        stats = embedder.cache.stats()
+        st.sidebar.caption(f"Embedding cache: {stats['entries']} entries, {stats['hit_rate']:.0%} hit rate ({stats['hits']}/{stats['hits'] + stats['misses']})")
+    report = embedder.scheduler.report()
+    if report['texts']:
+        st.sidebar.caption(f"Embedding: {report['tokens_per_sec']:.0f} tokens/sec, {report['padding_efficiency']:.0%} padding efficiency")
 
 # --- MAIN LOGIC ---
 if uploaded_files:
@@ -65,180 +129,137 @@ if uploaded_files:
         pdf_paths = []
         collection_names = []
         pdf_name_map = {}
+        pdf_path_map = {}
+        # Stored path per upload, so reruns neither re-hash nor rewrite the file
+        stored_uploads = st.session_state.setdefault('stored_uploads', {})
+        from ingestion.upload_store import store_upload
         for uploaded_file in uploaded_files:
-            temp_dir = tempfile.gettempdir()
-            pdf_path = os.path.join(temp_dir, uploaded_file.name)
-            with open(pdf_path, "wb") as f:
-                f.write(uploaded_file.read())
+            upload_key = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+            pdf_path = stored_uploads.get(upload_key)
+            if pdf_path is None or not os.path.exists(pdf_path):
+                pdf_path = stored_uploads[upload_key] = store_upload(uploaded_file)
             pdf_paths.append(pdf_path)
-            pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-            collection_name = sanitize_collection_name(pdf_name)
+            collection_name = sanitize_collection_name(os.path.splitext(uploaded_file.name)[0])
             collection_names.append(collection_name)
-            pdf_name_map[collection_name] = os.path.basename(pdf_path)
+            pdf_name_map[collection_name] = uploaded_file.name
+            pdf_path_map[collection_name] = pdf_path
 
         if st.button("Extract Text & Ingest to Vector DB"):
             try:
-                sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-                from ingestion.pdf_ingestor import PDFIngestor
-                import chromadb
-                from chromadb.config import Settings
-                from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-                embedding_function = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-                client = chromadb.Client(Settings(persist_directory=chroma_db_path))
+                service = get_ingest_service(chroma_db_path)
                 for pdf_path, collection_name in zip(pdf_paths, collection_names):
-                    ingestor = PDFIngestor(pdf_path)
-                    pages = ingestor.doc
-                    extracted = []
-                    for i, page in enumerate(pages):
-                        page_no = i + 1
-                        text = page.get_text()
-                        images = []
-                        for img_index, img in enumerate(page.get_images(full=True)):
-                            xref = img[0]
-                            base_image = ingestor.doc.extract_image(xref)
-                            img_bytes = base_image['image']
-                            img_ext = base_image['ext']
-                            img_path = os.path.join(images_dir, f"{collection_name}_page{page_no}_img{img_index+1}.{img_ext}")
-                            with open(img_path, "wb") as img_file:
-                                img_file.write(img_bytes)
-                            images.append({
-                                "image_path": os.path.relpath(img_path, output_dir),
-                                "bbox": img[5:9] if len(img) > 8 else None
-                            })
-                        extracted.append({
-                            "page_no": page_no,
-                            "text": text,
-                            "images": images
-                        })
-                    json_path = os.path.join(output_dir, f"{collection_name}.json")
-                    with open(json_path, "w") as f:
-                        json.dump(extracted, f, indent=2)
-                    collection = client.get_or_create_collection(collection_name, embedding_function=embedding_function)
-                    for page in extracted:
-                        page_no = page["page_no"]
-                        text = page["text"]
-                        images = page.get("images", [])
-                        image_paths = ','.join([img['image_path'] for img in images]) if images else ""
-                        for idx, chunk in enumerate(chunk_text(text)):
-                            doc_id = str(uuid.uuid4())
-                            metadata = {
-                                "page_no": int(page_no),
-                                "chunk_idx": int(idx),
-                                "images": image_paths,
-                                "pdf_name": str(collection_name)
-                            }
-                            collection.add(
-                                documents=[chunk],
-                                metadatas=[metadata],
-                                ids=[doc_id]
-                            )
-                st.success("Extraction and vector DB ingestion complete for all PDFs! Download your JSONs below.")
-                for collection_name in collection_names:
-                    json_path = os.path.join(output_dir, f"{collection_name}.json")
-                    with open(json_path, "rb") as f:
-                        st.download_button(f"Download JSON for {pdf_name_map[collection_name]}", f, file_name=f"{collection_name}.json", mime="application/json")
+                    service.submit(pdf_path, collection_name)
+                st.session_state['ingest_jobs'] = pdf_paths
             except Exception as e:
-                st.error(f"Extraction/Ingestion failed: {e}")
+                st.error(f"Submitting ingestion jobs failed: {e}")
                 st.text(traceback.format_exc())
+        ingest_jobs = [path for path in st.session_state.get('ingest_jobs', []) if path in pdf_paths]
+        if ingest_jobs:
+            show_ingest_progress(ingest_jobs, output_dir)
 
         # --- CHAT BLOCK ---
         try:
-            import chromadb
-            from chromadb.config import Settings
-            from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-            embedding_function = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-            client = chromadb.Client(Settings(persist_directory=chroma_db_path))
-            collections = [client.get_or_create_collection(name, embedding_function=embedding_function) for name in collection_names]
+            client = get_client(chroma_db_path)
+            from utils.config import RETRIEVAL_TOP_K, RERANK_ENABLED, RERANK_CANDIDATES, RERANK_TOP_K
+            retriever = get_retriever(client, collection_names)
+            from retrieval.query_builder import QueryBuilder
+            query_builder = QueryBuilder(get_text_embedder())
+            reranker = get_reranker() if RERANK_ENABLED else None
+            from utils.config import QUERY_CACHE_ENABLED, QUERY_CACHE_SEMANTIC_THRESHOLD
+            query_cache = get_query_cache() if QUERY_CACHE_ENABLED else None
+            from utils.config import ANSWER_GENERATOR
             gemini_api_key = os.environ.get("GEMINI_API_KEY", "")
-            if not gemini_api_key:
+            if ANSWER_GENERATOR == 'gemini' and not gemini_api_key:
                 st.error("GEMINI_API_KEY is not set in your .env file. Please add it and restart the app.")
                 st.stop()
-            from httpx import AsyncClient
-            from pydantic_ai import Agent
-            from pydantic_ai.models.gemini import GeminiModel
-            from pydantic_ai.providers.google_gla import GoogleGLAProvider
-            custom_http_client = AsyncClient(timeout=30)
-            gemini_model = GeminiModel(
-                'gemini-1.5-flash',
-                provider=GoogleGLAProvider(api_key=gemini_api_key, http_client=custom_http_client),
-            )
-            agent = Agent(gemini_model)
+            from generation.generators import build_generator
+            generator = build_generator(ANSWER_GENERATOR, api_key=gemini_api_key)
+            from generation.streaming import StreamTimer
+            from generation.context_builder import ContextBuilder, estimate_tokens
+            context_builder = ContextBuilder()
             user_query = st.text_input("Ask your PDFs:")
             if user_query:
                 if 'chat_history' not in st.session_state:
                     st.session_state['chat_history'] = []
                 st.session_state['chat_history'].append({"role": "user", "content": user_query})
-                chat_context = st.session_state['chat_history'][-5:]
-                chat_prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_context])
-                import asyncio
-                async def get_agent_answer():
-                    try:
-                        all_docs = []
-                        all_metas = []
-                        for collection in collections:
-                            results = collection.query(query_texts=[chat_prompt], n_results=3)
-                            all_docs.extend(results['documents'][0])
-                            all_metas.extend(results['metadatas'][0])
-                        context = "\n".join(all_docs)
-                        full_prompt = f"Context from PDFs:\n{context}\n\nUser: {user_query}"
-                        return all_docs, all_metas, await agent.run(full_prompt)
-                    except Exception as e:
-                        return [], [], f"Error during retrieval or chat: {e}\n{traceback.format_exc()}"
+                previous_questions = [msg['content'] for msg in st.session_state['chat_history'][:-1] if msg['role'] == 'user']
+                for msg in st.session_state['chat_history'][-10:]:
+                    if msg['role'] == 'user':
+                        st.markdown(f"**You:** {msg['content']}")
+                    else:
+                        st.markdown(f"**Agent:**\n\n{str(msg['content']).strip()}")
                 try:
-                    loop = asyncio.get_running_loop()
-                except RuntimeError:
-                    loop = None
-                if loop and loop.is_running():
-                    import nest_asyncio
-                    nest_asyncio.apply()
-                    docs, metadatas, answer = loop.run_until_complete(get_agent_answer())
-                else:
-                    docs, metadatas, answer = asyncio.run(get_agent_answer())
+                    # The answer cache is keyed on the query retrieval runs: a follow-up
+                    # rewritten with the previous question's terms only matches the same
+                    # rewritten query, never another conversation's "what about that?"
+                    query = query_builder.build(user_query, previous_questions)
+                    query_embedding = query['embedding'] if QUERY_CACHE_SEMANTIC_THRESHOLD is not None else None
+                    cached = query_cache.get(query['text'], collection_names, query_embedding) if query_cache else None
+                    if cached:
+                        docs, metadatas, answer = cached
+                        show_sources(metadatas)
+                        st.markdown(f"**Agent:**\n\n{answer}")
+                    else:
+                        if reranker:
+                            hits = retriever.query(query['text'], k=RERANK_CANDIDATES, embedding=query['embedding'])
+                            hits = reranker.rerank(user_query, hits, RERANK_TOP_K)
+                        else:
+                            hits = retriever.query(query['text'], k=RETRIEVAL_TOP_K, embedding=query['embedding'])
+                        assembled = context_builder.build(hits)
+                        docs = [hit['document'] for hit in assembled['hits']]
+                        metadatas = [hit['metadata'] for hit in assembled['hits']]
+                        # References are shown before generation starts
+                        show_sources(metadatas)
+                        full_prompt = f"Context from PDFs:\n{assembled['context']}\n\nUser: {user_query}"
+                        prompt_tokens = estimate_tokens(full_prompt)
+                        st.markdown("**Agent:**")
+                        timer = StreamTimer()
+                        answer = st.write_stream(timer.wrap(generator.stream(full_prompt)))
+                        st.caption(f"Prompt ~{prompt_tokens} tokens ({assembled['tokens']} context from {assembled['input_tokens']} retrieved) · "
+                                   f"first token {timer.time_to_first_token or 0:.2f}s · total {timer.total or 0:.2f}s")
+                        # Failed retrieval/chat returns no documents and is not cached
+                        if query_cache and docs:
+                            query_cache.put(query['text'], collection_names, (docs, metadatas, answer), query_embedding)
+                except Exception as e:
+                    docs, metadatas = [], []
+                    answer = f"Error during retrieval or chat: {e}\n{traceback.format_exc()}"
+                    st.error(answer)
                 st.session_state['chat_history'].append({"role": "agent", "content": answer})
+                show_embedding_stats()
                 st.session_state['last_refs'] = list(zip(docs, metadatas))
                 if 'open_ref' not in st.session_state:
                     st.session_state['open_ref'] = None
-                for idx, msg in enumerate(st.session_state['chat_history'][-10:]):
-                    if msg['role'] == 'user':
-                        st.markdown(f"**You:** {msg['content']}")
-                    else:
-                        agent_content = str(msg['content']).strip()
-                        st.markdown(f"**Agent:**\n\n{agent_content}")
-                        if idx == len(st.session_state['chat_history'][-10:]) - 1 and 'last_refs' in st.session_state:
-                            for ref_idx, (doc, meta) in enumerate(st.session_state['last_refs']):
-                                pdf_file = pdf_name_map.get(meta.get('pdf_name', ''), None)
-                                ref_btn = st.button(
-                                    f"Show Reference {ref_idx+1} (PDF: {pdf_file}, Page {meta.get('page_no', '?')})",
-                                    key=f"refbtn_{len(st.session_state['chat_history'])}_{ref_idx}"
-                                )
-                                if ref_btn:
-                                    st.session_state['open_ref'] = (len(st.session_state['chat_history']), ref_idx)
-                                # Only show the image if this reference is open and the button was clicked
-                                if st.session_state.get('open_ref') == (len(st.session_state['chat_history']), ref_idx):
-                                    page_no = meta.get('page_no', None)
-                                    if page_no is not None and pdf_file:
-                                        ref_label = f"Reference: {pdf_file} - Page {page_no}"
-                                        pdf_path = None
-                                        for p in pdf_paths:
-                                            if os.path.basename(p) == pdf_file:
-                                                pdf_path = p
-                                                break
-                                        if pdf_path:
-                                            try:
-                                                from pdf2image import convert_from_path
-                                                # Ensure page_no is int and valid
-                                                page_no_int = int(page_no)
-                                                images = convert_from_path(pdf_path, first_page=page_no_int, last_page=page_no_int, fmt='jpeg', single_file=True)
-                                                if images and len(images) > 0:
-                                                    st.image(images[0], caption=ref_label, use_container_width=True)
-                                                else:
-                                                    st.warning(f"Could not render page {page_no} from PDF. PDF path: {pdf_path}")
-                                            except Exception as e:
-                                                st.warning(f"Error rendering PDF page: {e}\nPDF path: {pdf_path}")
+                if 'last_refs' in st.session_state:
+                    for ref_idx, (doc, meta) in enumerate(st.session_state['last_refs']):
+                        pdf_file = pdf_name_map.get(meta.get('pdf_name', ''), None)
+                        ref_btn = st.button(
+                            f"Show Reference {ref_idx+1} (PDF: {pdf_file}, Page {meta.get('page_no', '?')})",
+                            key=f"refbtn_{len(st.session_state['chat_history'])}_{ref_idx}"
+                        )
+                        if ref_btn:
+                            st.session_state['open_ref'] = (len(st.session_state['chat_history']), ref_idx)
+                        # Only show the image if this reference is open and the button was clicked
+                        if st.session_state.get('open_ref') == (len(st.session_state['chat_history']), ref_idx):
+                            page_no = meta.get('page_no', None)
+                            if page_no is not None and pdf_file:
+                                ref_label = f"Reference: {pdf_file} - Page {page_no}"
+                                pdf_path = pdf_path_map.get(meta.get('pdf_name', ''))
+                                if pdf_path:
+                                    try:
+                                        from ingestion.provenance import parse_boxes
+                                        boxes = parse_boxes(meta.get('bboxes', ''))
+                                        # Chunks with provenance show just their highlighted region
+                                        if boxes:
+                                            preview_path = get_preview_cache().highlight(pdf_path, int(page_no), boxes)
                                         else:
-                                            st.warning(f"PDF file not found for reference: {pdf_file}")
-                                    else:
-                                        st.warning("Reference metadata missing page number or PDF file.")
+                                            preview_path = get_preview_cache().render(pdf_path, int(page_no))
+                                        st.image(preview_path, caption=ref_label, use_container_width=True)
+                                    except Exception as e:
+                                        st.warning(f"Error rendering PDF page: {e}\nPDF path: {pdf_path}")
+                                else:
+                                    st.warning(f"PDF file not found for reference: {pdf_file}")
+                            else:
+                                st.warning("Reference metadata missing page number or PDF file.")
         except Exception as e:
             st.error(f"Critical error: {e}")
             st.text(traceback.format_exc())
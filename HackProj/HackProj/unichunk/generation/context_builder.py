@@ -0,0 +1,86 @@
+# Context Builder
+# Turns retrieved hits into the prompt context: neighbouring chunks of the same
+# page are merged (dropping the overlap chunk_text repeats at the start of each
+# chunk), spans already contained in another span are dropped, and spans are
+# packed best-first into a token budget
+import re
+
+from utils.config import CONTEXT_TOKEN_BUDGET, CHUNK_OVERLAP
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+def overlap_length(left, right, max_overlap=CHUNK_OVERLAP * 2):
+    # Longest suffix of left that is also a prefix of right
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _normalized(text):
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class ContextBuilder:
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, count_tokens=estimate_tokens):
+        self.token_budget = token_budget
+        self.count_tokens = count_tokens
+
+    def merge(self, hits):
+        # hits arrive best first; a span scores as its best member
+        pages = {}
+        for rank, hit in enumerate(hits):
+            meta = hit.get('metadata') or {}
+            key = (meta.get('pdf_name'), meta.get('page_no'))
+            pages.setdefault(key, []).append((meta.get('chunk_idx'), rank, hit))
+        spans = []
+        for (pdf_name, page_no), members in pages.items():
+            members.sort(key=lambda m: (m[0] is None, m[0] if m[0] is not None else 0))
+            current = None
+            for chunk_idx, rank, hit in members:
+                text = hit['document'] or ''
+                adjacent = current is not None and chunk_idx is not None and current['last_idx'] is not None and chunk_idx == current['last_idx'] + 1
+                if adjacent:
+                    current['text'] += text[overlap_length(current['text'], text):]
+                    current['last_idx'] = chunk_idx
+                    current['rank'] = min(current['rank'], rank)
+                    current['hits'].append(hit)
+                    continue
+                current = {'pdf_name': pdf_name, 'page_no': page_no, 'text': text, 'last_idx': chunk_idx, 'rank': rank, 'hits': [hit]}
+                spans.append(current)
+        return spans
+
+    def deduplicate(self, spans):
+        kept = []
+        for span in sorted(spans, key=lambda s: len(s['text']), reverse=True):
+            norm = _normalized(span['text'])
+            if any(norm in _normalized(k['text']) for k in kept):
+                continue
+            kept.append(span)
+        return kept
+
+    def build(self, hits):
+        input_tokens = sum(self.count_tokens(h['document'] or '') for h in hits)
+        spans = sorted(self.deduplicate(self.merge(hits)), key=lambda s: s['rank'])
+        packed = []
+        used = 0
+        for span in spans:
+            header = f"[{span['pdf_name']} p.{span['page_no']}]"
+            tokens = self.count_tokens(header) + self.count_tokens(span['text'])
+            if used + tokens > self.token_budget:
+                continue
+            span['tokens'] = tokens
+            packed.append((header, span))
+            used += tokens
+        return {
+            'context': "\n\n".join(f"{header}\n{span['text']}" for header, span in packed),
+            'tokens': used,
+            'input_tokens': input_tokens,
+            'spans': [span for _, span in packed],
+            'dropped': len(spans) - len(packed),
+            'hits': [hit for _, span in packed for hit in span['hits']]
+        }
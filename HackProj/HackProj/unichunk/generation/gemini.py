@@ -0,0 +1,25 @@
+# Gemini answer generation through pydantic-ai, streamed as text deltas
+from utils.config import GEMINI_MODEL, GEMINI_TIMEOUT
+from generation.streaming import iter_async
+
+
+def build_agent(api_key, model_name=GEMINI_MODEL, timeout=GEMINI_TIMEOUT):
+    from httpx import AsyncClient
+    from pydantic_ai import Agent
+    from pydantic_ai.models.gemini import GeminiModel
+    from pydantic_ai.providers.google_gla import GoogleGLAProvider
+    model = GeminiModel(
+        model_name,
+        provider=GoogleGLAProvider(api_key=api_key, http_client=AsyncClient(timeout=timeout)),
+    )
+    return Agent(model)
+
+
+def stream_answer(api_key, prompt, model_name=GEMINI_MODEL):
+    async def deltas():
+        # The agent (and its httpx client) is created on the streaming thread's own loop
+        agent = build_agent(api_key, model_name)
+        async with agent.run_stream(prompt) as result:
+            async for delta in result.stream_text(delta=True):
+                yield delta
+    return iter_async(deltas)
@@ -0,0 +1,63 @@
+# Answer generators
+# Everything the chat path needs from an LLM: stream(prompt) yields text deltas.
+# EchoGenerator is a deterministic offline stand-in that can simulate latency,
+# so retrieval and prompt building can be exercised without an API key.
+import re
+import time
+
+from utils.config import ANSWER_GENERATOR, GEMINI_MODEL, ECHO_FIRST_TOKEN_DELAY, ECHO_TOKEN_DELAY
+
+
+class AnswerGenerator:
+    name = 'base'
+
+    def stream(self, prompt):
+        raise NotImplementedError
+
+    def generate(self, prompt):
+        return ''.join(self.stream(prompt))
+
+
+class GeminiGenerator(AnswerGenerator):
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is required for the gemini answer generator")
+        self.api_key = api_key
+        self.model_name = model_name
+
+    def stream(self, prompt):
+        from generation.gemini import stream_answer
+        return stream_answer(self.api_key, prompt, self.model_name)
+
+
+class EchoGenerator(AnswerGenerator):
+    name = 'echo'
+
+    def __init__(self, first_token_delay=ECHO_FIRST_TOKEN_DELAY, token_delay=ECHO_TOKEN_DELAY, max_words=60):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.max_words = max_words
+
+    def stream(self, prompt):
+        question = prompt.rsplit("User:", 1)[-1].strip()
+        sources = re.findall(r"^\[(.+?)\]$", prompt, flags=re.MULTILINE)
+        context = [line for line in prompt.rsplit("User:", 1)[0].splitlines()
+                   if not re.match(r"^\[.+\]$", line) and not line.startswith("Context from PDFs")]
+        words = ' '.join(context).split()[:self.max_words]
+        text = f"Offline answer to: {question}\n\nSources: {', '.join(sources) or 'none'}\n\n{' '.join(words)}"
+        if self.first_token_delay:
+            time.sleep(self.first_token_delay)
+        for i, token in enumerate(re.findall(r"\S+\s*", text)):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            yield token
+
+
+def build_generator(name=ANSWER_GENERATOR, api_key=None):
+    if name == 'gemini':
+        return GeminiGenerator(api_key)
+    if name == 'echo':
+        return EchoGenerator()
+    raise ValueError(f"Unknown answer generator '{name}', expected 'gemini' or 'echo'")
@@ -0,0 +1,61 @@
+# Streaming helpers
+# Bridges an async token stream (pydantic-ai) into a plain generator that
+# Streamlit can render incrementally, without nest_asyncio, and times the
+# first token separately from the full answer
+import asyncio
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+def iter_async(make_stream):
+    # make_stream() returns an async iterator; it runs on its own event loop in
+    # a background thread and items are handed over through a queue
+    items = queue.Queue()
+
+    def run():
+        async def pump():
+            async for item in make_stream():
+                items.put(item)
+        try:
+            asyncio.run(pump())
+        except BaseException as e:
+            items.put(e)
+        finally:
+            items.put(_DONE)
+
+    threading.Thread(target=run, daemon=True, name='answer-stream').start()
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+class StreamTimer:
+    def __init__(self):
+        self.start = None
+        self.first_token = None
+        self.end = None
+        self.chunks = 0
+
+    def wrap(self, stream):
+        self.start = time.perf_counter()
+        for chunk in stream:
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.chunks += 1
+            yield chunk
+        self.end = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        return self.first_token - self.start if self.first_token is not None else None
+
+    @property
+    def total(self):
+        return self.end - self.start if self.end is not None else None
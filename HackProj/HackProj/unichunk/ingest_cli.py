@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Batch ingestion CLI
+# Crawls directories for PDFs and ingests them without the Streamlit app.
+# Worker processes extract, chunk and embed page batches; the main process is
+# the only writer to Chroma, the lexical index and the job ledger, and records
+# each batch in the ledger once it is stored. Rerunning the command after a
+# crash resumes every interrupted document after its last completed page.
+#
+#   python ingest_cli.py [dirs ...] [--workers N] [--retry-failed] [--no-images]
+
+import argparse
+
+from ingestion.batch_ingest import BatchIngester
+from ingestion.indexer import DocumentIndexer
+from ingestion.job_ledger import JobLedger, CLI
+from retrieval.factory import open_client
+from utils.config import DATA_DIR, INGEST_WORKERS, INGEST_LEDGER_PATH, EMBED_IMAGES, INDEX_PAGE_BATCH, METRICS_FILE
+from utils.metrics import METRICS
+from utils.naming import document_name
+
+
+def crawl(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            yield root, os.path.dirname(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith('.pdf'):
+                    yield os.path.join(dirpath, filename), root
+
+
+def show(ingester, documents, end='\r'):
+    stats = ingester.stats
+    pages_per_sec, chunks_per_sec = ingester.rates()
+    print(f"{stats['finished']}/{documents} docs  {stats['failed']} failed  {stats['pages']} pages  {stats['chunks']} chunks  "
+          f"{pages_per_sec:.1f} pages/sec  {chunks_per_sec:.1f} chunks/sec  "
+          f"{stats['paused']} handed back  {stats['restarts']} restarts", end=end, flush=True)
+
+
+def run(jobs, ledger, writer, workers, embed_images, page_batch):
+    with BatchIngester(ledger, writer, workers, embed_images, page_batch) as ingester:
+        for job in jobs:
+            ingester.submit(job)
+        while ingester.active:
+            message = ingester.step()
+            if message and message[0] == 'error':
+                print(f"\n{message[1]}: {message[2]}")
+            show(ingester, len(jobs))
+    show(ingester, len(jobs), end='\n')
+    return ingester.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest directories of PDFs into the UniChunk index")
+    parser.add_argument('paths', nargs='*', default=[DATA_DIR], help="Directories (crawled recursively) or PDF files")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS, help="Extraction/embedding processes")
+    parser.add_argument('--page-batch', type=int, default=INDEX_PAGE_BATCH, help="Pages per checkpointed batch")
+    parser.add_argument('--ledger', default=INGEST_LEDGER_PATH, help="SQLite job ledger used for resuming")
+    parser.add_argument('--retry-failed', action='store_true', help="Also retry documents that failed in earlier runs")
+    parser.add_argument('--no-images', action='store_true', help="Skip image embedding")
+    parser.add_argument('--metrics-out', default=METRICS_FILE, help="Write stage timings and counters as JSON here")
+    parser.add_argument('--metrics-port', type=int, default=0, help="Serve Prometheus metrics on this local port while running")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+
+    ledger = JobLedger(args.ledger)
+    found = 0
+    for path, root in crawl(args.paths):
+        ledger.register(os.path.abspath(path), document_name(path, root), CLI)
+        found += 1
+    jobs = ledger.pending(CLI, retry_failed=args.retry_failed)
+    resumed = sum(1 for job in jobs if job['pages_done'])
+    print(f"Found {found} PDFs, {len(jobs)} to ingest ({resumed} resumed)")
+    if jobs:
+        # The writer never embeds: chunks arrive with their vectors
+        writer = DocumentIndexer(open_client(), None, embed_images=False)
+        run(jobs, ledger, writer, args.workers, EMBED_IMAGES and not args.no_images, args.page_batch)
+        writer.close()
+        METRICS.write_json(args.metrics_out)
+        for name, s in METRICS.summary().items():
+            if name.startswith(('pipeline_stage_seconds', 'store_seconds', 'page_seconds')):
+                print(f"{name:<45} n={s['count']:<7} mean {s['mean'] * 1000:8.1f}ms  p95 <= {s['p95'] * 1000:.0f}ms")
+        print(f"Metrics written to {args.metrics_out}")
+    print(', '.join(f"{count} {status}" for status, count in sorted(ledger.summary().items())))
+    ledger.close()
+
+
+if __name__ == "__main__":
+    main()
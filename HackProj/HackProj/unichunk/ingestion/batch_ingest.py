@@ -0,0 +1,299 @@
+# Batch Ingest
+# Runs ingestion jobs from the job ledger: worker processes extract, chunk and
+# embed page batches and hand them back over a queue, and the owning process
+# writes each batch to the stores and checkpoints it in the ledger. Used by
+# the batch CLI and, through IngestService, by the app, which keeps serving
+# queries from the same Chroma client while documents are being ingested.
+#
+# Workers look texts up in the embedding cache read-only and send the vectors
+# they had to compute back with each batch; the owning process, the cache's
+# only writer, stores them, so repeated boilerplate skips the model on later
+# documents.
+#
+# Workers are supervised: one past its RSS limit or page budget hands the
+# rest of its document back at the next batch boundary and exits, and a
+# fresh process takes its place. A worker that dies outright (e.g. OOM-killed)
+# is replaced too, and its document resumes after its last stored page.
+import multiprocessing
+import threading
+import time
+from collections import deque
+from queue import Empty
+
+from ingestion.indexer import DocumentIndexer
+from embedding.embedding_cache import shared_cache
+from ingestion.job_ledger import JobLedger, APP
+from utils.memory import MemoryGovernor
+from utils.metrics import METRICS
+from utils.config import (INGEST_WORKERS, INGEST_LEDGER_PATH, INGEST_POLL_SECONDS, EMBED_IMAGES, INDEX_PAGE_BATCH,
+                          INGEST_WORKER_RSS_MB, INGEST_RECYCLE_PAGES, INGEST_MAX_RESTARTS, EMBED_CACHE_DIR)
+
+_indexer = None
+
+
+def _init_worker(embed_images, page_batch, cache_dir):
+    global _indexer
+    from embedding.text_embedder import TextEmbedder
+    embedder = TextEmbedder(cache_dir=cache_dir, cache_read_only=True)
+    _indexer = DocumentIndexer(None, embedder, embed_images=embed_images, page_batch=page_batch)
+
+
+def _send(queue, kind, path, payload):
+    # This process's timings and counters since the last message ride along
+    queue.put((kind, path, payload, METRICS.snapshot(reset=True)))
+
+
+def _produce(path, pdf_name, start_page, queue, governor):
+    try:
+        for batch in _indexer.iter_batches(path, pdf_name, start_page):
+            _indexer.spill(pdf_name, batch['pages'])
+            _send(queue, 'batch', path, batch)
+            governor.add_pages(len(batch['pages']))
+            reason = governor.exhausted()
+            if reason and batch['last_page'] < batch['total_pages']:
+                _send(queue, 'paused', path, {'next_page': batch['last_page'] + 1, 'reason': reason})
+                return
+        _send(queue, 'done', path, _indexer.image_batch(pdf_name))
+    except Exception as e:
+        _send(queue, 'error', path, f"{type(e).__name__}: {e}")
+
+
+def _work(tasks, queue, embed_images, page_batch, cache_dir, rss_limit_mb, recycle_pages):
+    _init_worker(embed_images, page_batch, cache_dir)
+    governor = MemoryGovernor(rss_limit_mb, recycle_pages)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        _produce(*task, queue, governor)
+        if governor.exhausted():
+            # Exiting hands everything this process accumulated back to the OS
+            return
+
+
+class _Worker:
+    def __init__(self, context, queue, args):
+        self.tasks = context.Queue()
+        # Not a daemon: the embedder may start its own processes
+        self.process = context.Process(target=_work, args=(self.tasks, queue) + args, name='ingest-worker')
+        self.process.start()
+        self.path = None
+
+
+class BatchIngester:
+    def __init__(self, ledger, writer, workers=INGEST_WORKERS, embed_images=EMBED_IMAGES, page_batch=INDEX_PAGE_BATCH,
+                 rss_limit_mb=INGEST_WORKER_RSS_MB, recycle_pages=INGEST_RECYCLE_PAGES, max_restarts=INGEST_MAX_RESTARTS,
+                 cache_dir=EMBED_CACHE_DIR):
+        self.ledger = ledger
+        self.writer = writer
+        self.workers = max(workers, 1)
+        self.embed_images = embed_images
+        self.page_batch = page_batch
+        self.cache_dir = cache_dir
+        self.rss_limit_mb = rss_limit_mb
+        self.recycle_pages = recycle_pages
+        self.max_restarts = max_restarts
+        self.stats = {'finished': 0, 'failed': 0, 'pages': 0, 'chunks': 0, 'paused': 0, 'restarts': 0}
+        self._names = {}
+        self._restarts = {}
+        self._backlog = deque()
+        self._idle_deaths = 0
+        self._start = time.perf_counter()
+
+    def __enter__(self):
+        self._context = multiprocessing.get_context('spawn')
+        self._manager = self._context.Manager()
+        self.queue = self._manager.Queue(maxsize=self.workers * 4)
+        self._workers = [self._spawn() for _ in range(self.workers)]
+        return self
+
+    def __exit__(self, *exc):
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.tasks.put(None)
+        for worker in self._workers:
+            # Busy workers are stopped; the ledger already has their progress
+            worker.process.join(timeout=0 if worker.path else 5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+        self._manager.shutdown()
+
+    def _spawn(self):
+        return _Worker(self._context, self.queue, (self.embed_images, self.page_batch, self.cache_dir, self.rss_limit_mb, self.recycle_pages))
+
+    @property
+    def active(self):
+        return set(self._names)
+
+    def rates(self):
+        seconds = max(time.perf_counter() - self._start, 1e-9)
+        return self.stats['pages'] / seconds, self.stats['chunks'] / seconds
+
+    def submit(self, job):
+        resume = job['pages_done'] > 0
+        if not resume:
+            self.writer.begin(job['pdf_name'])
+        self.ledger.start(job['path'], resume=resume)
+        self._names[job['path']] = job['pdf_name']
+        self._backlog.append((job['path'], job['pdf_name'], job['pages_done'] + 1))
+        self._dispatch()
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self._backlog:
+                return
+            if worker.path is None and worker.process.is_alive():
+                task = self._backlog.popleft()
+                worker.path = task[0]
+                worker.tasks.put(task)
+
+    def _release(self, path):
+        for worker in self._workers:
+            if worker.path == path:
+                worker.path = None
+
+    def _store_embeddings(self, updates):
+        cache = shared_cache(updates['model_key'], updates['dim'], self.cache_dir)
+        cache.store_many(updates['keys'], updates['vectors'])
+        cache.touch(updates['used'])
+        cache.flush()
+
+    def _failed(self, path, error):
+        self.ledger.fail(path, error)
+        self.stats['failed'] += 1
+        self._names.pop(path, None)
+        self._restarts.pop(path, None)
+
+    def _reap(self, drained):
+        # Replaces workers that exited. One that died with a document in hand
+        # is only handled once the queue is drained, so the ledger has every
+        # batch it sent and the document resumes right after them
+        for i, worker in enumerate(self._workers):
+            if worker.process.is_alive() or (worker.path and not drained):
+                continue
+            path = worker.path
+            if path is not None and path not in self._names:
+                # Already failed; there is nothing to resume
+                pass
+            elif path is not None and not worker.process.exitcode:
+                # Retired cleanly before it picked up the document just handed to it
+                self._backlog.appendleft((path, self._names[path], self.ledger.jobs([path])[0]['pages_done'] + 1))
+            elif path is not None:
+                self._restarts[path] = self._restarts.get(path, 0) + 1
+                if self._restarts[path] > self.max_restarts:
+                    self._failed(path, f"worker died {self._restarts[path]} times (exit code {worker.process.exitcode})")
+                else:
+                    self.stats['restarts'] += 1
+                    pages_done = self.ledger.jobs([path])[0]['pages_done']
+                    self._backlog.appendleft((path, self._names[path], pages_done + 1))
+            elif worker.process.exitcode:
+                # Dying without a document usually means the worker cannot start at all
+                self._idle_deaths += 1
+                if self._idle_deaths > self.max_restarts:
+                    raise RuntimeError(f"Ingest workers keep exiting (exit code {worker.process.exitcode})")
+            worker.process.join()
+            self._workers[i] = self._spawn()
+
+    def step(self, timeout=1.0):
+        # Handles one message from the workers; returns (kind, path, payload) or None
+        try:
+            kind, path, payload, metrics = self.queue.get(timeout=timeout)
+        except Empty:
+            self._reap(drained=True)
+            self._dispatch()
+            return None
+        METRICS.merge(metrics)
+        pdf_name = self._names.get(path)
+        if pdf_name is None:
+            # The document already failed (e.g. a write error) while its worker
+            # kept going; the rest of its messages are dropped
+            if kind != 'batch':
+                self._release(path)
+            elif payload.get('cache'):
+                # Its vectors are still good for the embedding cache
+                self._store_embeddings(payload['cache'])
+            self._reap(drained=False)
+            self._dispatch()
+            return None
+        if kind == 'batch':
+            try:
+                updates = payload.pop('cache', None)
+                if updates:
+                    self._store_embeddings(updates)
+                self.writer.write_batch(pdf_name, payload)
+                self.ledger.page_done(path, payload['last_page'], payload['total_pages'], len(payload['chunks']))
+                self.stats['pages'] += len(payload['pages'])
+                self.stats['chunks'] += len(payload['chunks'])
+            except Exception as e:
+                kind, payload = 'error', f"{type(e).__name__}: {e}"
+                self._failed(path, payload)
+        elif kind == 'paused':
+            # The rest of the document goes first to the next free worker
+            self._release(path)
+            self.stats['paused'] += 1
+            self._backlog.appendleft((path, pdf_name, payload['next_page']))
+        elif kind == 'done':
+            self._release(path)
+            try:
+                self.writer.write_images(pdf_name, payload)
+                self.writer.finish(pdf_name)
+                self.ledger.finish(path)
+                self.stats['finished'] += 1
+                self._names.pop(path)
+                self._restarts.pop(path, None)
+            except Exception as e:
+                kind, payload = 'error', f"{type(e).__name__}: {e}"
+                self._failed(path, payload)
+        else:
+            self._release(path)
+            self._failed(path, payload)
+        self._reap(drained=False)
+        self._dispatch()
+        return kind, path, payload
+
+
+class IngestService:
+    # Background thread that keeps picking up pending ledger jobs and writes
+    # them through the caller's Chroma client and lexical index
+    def __init__(self, client, lexical_index=None, ledger_path=INGEST_LEDGER_PATH, workers=INGEST_WORKERS, poll=INGEST_POLL_SECONDS):
+        self.client = client
+        self.lexical_index = lexical_index
+        self.ledger_path = ledger_path
+        self.workers = workers
+        self.poll = poll
+        self.error = None
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='ingest-service', daemon=True)
+        self._thread.start()
+
+    def submit(self, path, pdf_name):
+        ledger = JobLedger(self.ledger_path)
+        try:
+            ledger.submit(path, pdf_name, APP)
+        finally:
+            ledger.close()
+        self._wake.set()
+
+    def alive(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        try:
+            ledger = JobLedger(self.ledger_path)
+            writer = DocumentIndexer(self.client, None, self.lexical_index, embed_images=False)
+            with BatchIngester(ledger, writer, self.workers) as ingester:
+                while True:
+                    active = ingester.active
+                    # Only the app's own jobs; jobs interrupted by an app restart are resumed as well
+                    for job in ledger.pending(APP):
+                        if job['path'] not in active and len(active) < ingester.workers:
+                            ingester.submit(job)
+                            active.add(job['path'])
+                    if active:
+                        ingester.step(self.poll)
+                    else:
+                        self._wake.wait(self.poll)
+                        self._wake.clear()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
@@ -0,0 +1,80 @@
+# Embedded Image Extraction
+# Pulls embedded images out of PDF pages, deduplicating by xref and content hash,
+# and writes new images to disk on a background thread pool
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.config import IMAGE_WRITE_WORKERS
+
+
+def _write_file(path, data):
+    # Images are content-addressed, so several ingest workers may write the
+    # same file at once; each writer needs its own temp file
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ImageExtractor:
+    def __init__(self, images_dir, output_dir=None, max_workers=IMAGE_WRITE_WORKERS):
+        self.images_dir = images_dir
+        self.output_dir = output_dir or os.path.dirname(images_dir)
+        os.makedirs(images_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = []
+        self._by_xref = {}
+        self._by_hash = {}
+        self.stats = {'references': 0, 'extracted': 0, 'written': 0}
+
+    def _image_path(self, doc, xref):
+        key = (doc.name, xref)
+        if key in self._by_xref:
+            return self._by_xref[key]
+        base_image = doc.extract_image(xref)
+        if not base_image:
+            self._by_xref[key] = None
+            return None
+        self.stats['extracted'] += 1
+        img_bytes = base_image['image']
+        digest = hashlib.sha1(img_bytes).hexdigest()
+        path = self._by_hash.get(digest)
+        if path is None:
+            path = os.path.join(self.images_dir, f"{digest}.{base_image['ext']}")
+            self._by_hash[digest] = path
+            if not os.path.exists(path):
+                self._pending.append(self._pool.submit(_write_file, path, img_bytes))
+                self.stats['written'] += 1
+        self._by_xref[key] = path
+        return path
+
+    def extract_page(self, doc, page):
+        images = []
+        seen = set()
+        for img in page.get_images(full=True):
+            xref = img[0]
+            if xref in seen:
+                continue
+            seen.add(xref)
+            self.stats['references'] += 1
+            img_path = self._image_path(doc, xref)
+            if img_path is None:
+                continue
+            rects = page.get_image_rects(xref)
+            images.append({
+                "image_path": os.path.relpath(img_path, self.output_dir),
+                "xref": xref,
+                "bbox": [rects[0].x0, rects[0].y0, rects[0].x1, rects[0].y1] if rects else None
+            })
+        return images
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.flush()
+        self._pool.shutdown(wait=True)
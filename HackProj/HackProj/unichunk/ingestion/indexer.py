@@ -0,0 +1,232 @@
+# Document Indexer
+# Turns a PDF into page batches of chunks and embeddings through the staged
+# document pipeline (pipeline/document.py) and writes them to the vector
+# store. Producing batches (iter_batches) and writing them (write_batch /
+# finish) are separate so a batch ingester can run the former in worker
+# processes while one process owns the stores.
+import json
+import os
+
+from chunker.text_chunker import chunk_text, chunk_ranges
+from ingestion.image_extractor import ImageExtractor
+from ingestion.provenance import chunk_boxes, format_boxes
+from parser.table_extractor import table_text, table_json
+from retrieval.factory import open_text_store, open_image_store
+from retrieval.lexical_index import LexicalIndex
+from utils.config import OUTPUT_DIR, EMBED_IMAGES, INDEX_PAGE_BATCH, PREVIEW_PRERENDER, PIPELINE_LAYOUT
+from utils.index_version import bump_index_version
+from utils.metrics import METRICS
+
+
+def _read_jsonl(path):
+    # Blank or cut-short lines (a crash mid-write) are skipped
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+class DocumentIndexer:
+    def __init__(self, client, embedder, lexical_index=None, output_dir=OUTPUT_DIR, embed_images=EMBED_IMAGES, page_batch=INDEX_PAGE_BATCH, prerender=PREVIEW_PRERENDER):
+        self.client = client
+        self.embedder = embedder
+        self.lexical_index = lexical_index or LexicalIndex()
+        self.output_dir = output_dir
+        self.page_batch = page_batch
+        self.image_extractor = ImageExtractor(os.path.join(output_dir, 'images'), output_dir)
+        self.image_pipeline = None
+        if embed_images:
+            from embedding.image_embedder import ImageEmbedder
+            from embedding.image_pipeline import ImageEmbeddingPipeline
+            self.image_pipeline = ImageEmbeddingPipeline(ImageEmbedder())
+        self.preview_cache = None
+        if prerender:
+            from utils.preview_cache import PreviewCache
+            self.preview_cache = PreviewCache()
+
+    # --- producing ---
+
+    def chunk_page(self, page, pdf_name):
+        images = page.get("images", [])
+        image_paths = ','.join([img['image_path'] for img in images]) if images else ""
+        spans = page.get("spans", [])
+        ranges = chunk_ranges(page["text"]) if spans else None
+        chunks, metadatas = [], []
+        for idx, chunk in enumerate(chunk_text(page["text"])):
+            chunks.append(chunk)
+            metadatas.append({
+                "page_no": int(page["page_no"]),
+                "chunk_idx": int(idx),
+                "images": image_paths,
+                "bboxes": format_boxes(chunk_boxes(spans, *ranges[idx])) if spans else "",
+                "pdf_name": str(pdf_name)
+            })
+        # Each table is one more chunk: pipe-separated rows, with the rows kept as JSON
+        for table in page.get("tables", []):
+            chunks.append(table_text(table))
+            metadatas.append({
+                "page_no": int(page["page_no"]),
+                "chunk_idx": len(metadatas),
+                "images": image_paths,
+                "bboxes": format_boxes([table['bbox']]),
+                "pdf_name": str(pdf_name),
+                "type": "table",
+                "table": table_json(table)
+            })
+        return chunks, metadatas
+
+    def make_batch(self, pages, pdf_name, total_pages):
+        chunks, metadatas = [], []
+        for page in pages:
+            if 'chunks' not in page:
+                page['chunks'], page['metadatas'] = self.chunk_page(page, pdf_name)
+            # Only the page content goes on to the page JSON
+            chunks += page.pop('chunks')
+            metadatas += page.pop('metadatas')
+            page.pop('spans', None)
+        batch = {
+            'pages': pages,
+            'chunks': chunks,
+            'metadatas': metadatas,
+            'ids': [f"{pdf_name}:{m['page_no']}:{m['chunk_idx']}" for m in metadatas],
+            'embeddings': self.embedder.embed(chunks).tolist() if chunks and self.embedder is not None else None,
+            'last_page': pages[-1]['page_no'],
+            'total_pages': total_pages
+        }
+        updates = self.embedder.cache_updates() if self.embedder is not None else None
+        if updates:
+            # Embedding cache entries for the writer process (see BatchIngester)
+            batch['cache'] = updates
+        return batch
+
+    def iter_batches(self, pdf_path, pdf_name, start_page=1, layout=PIPELINE_LAYOUT):
+        from pipeline.document import DocumentPipeline
+        return DocumentPipeline(self, pdf_path, pdf_name, start_page, layout).run()
+
+    def spill(self, pdf_name, pages):
+        # Keeps the image references of produced pages on disk instead of in
+        # the worker until image_batch embeds them at the end of the document;
+        # survives the worker being recycled mid-document
+        lines = [json.dumps({'page_no': page['page_no'], 'images': page['images']}) + "\n"
+                 for page in pages if page.get('images')]
+        if lines:
+            os.makedirs(os.path.dirname(self._spill_path(pdf_name)), exist_ok=True)
+            with open(self._spill_path(pdf_name), 'a') as f:
+                f.writelines(lines)
+
+    def image_batch(self, pdf_name):
+        # Embeds every image referenced by the document's written or spilled pages
+        if not self.image_pipeline:
+            return None
+        image_pages = {}
+        for path in (self._pages_path(pdf_name), self._spill_path(pdf_name)):
+            for page in _read_jsonl(path):
+                for img in page.get("images", []):
+                    image_pages.setdefault(img['image_path'], set()).add(page["page_no"])
+        if not image_pages:
+            return None
+        image_pages = {p: sorted(nos) for p, nos in image_pages.items()}
+        self.image_extractor.flush()
+        paths, vectors = self.image_pipeline.run([os.path.join(self.output_dir, p) for p in image_pages])
+        if not paths:
+            return None
+        rel_paths = [os.path.relpath(p, self.output_dir) for p in paths]
+        return {
+            'ids': [f"{pdf_name}:{os.path.splitext(os.path.basename(p))[0]}" for p in rel_paths],
+            'embeddings': vectors.tolist(),
+            'metadatas': [{
+                "page_no": int(image_pages[p][0]),
+                "pages": ','.join(str(n) for n in image_pages[p]),
+                "image_path": p,
+                "pdf_name": str(pdf_name),
+                "type": "image"
+            } for p in rel_paths]
+        }
+
+    # --- writing ---
+
+    def _pages_path(self, pdf_name):
+        return os.path.join(self.output_dir, f"{pdf_name}.pages.jsonl")
+
+    def _spill_path(self, pdf_name):
+        return os.path.join(self.output_dir, 'spill', f"{pdf_name}.images.jsonl")
+
+    def iter_pages(self, pdf_name):
+        # Yields the written pages in order, one at a time. A batch replayed
+        # after a crash overwrites its earlier copy, so only the offset of the
+        # last copy of each page is kept
+        path = self._pages_path(pdf_name)
+        if not os.path.exists(path):
+            return
+        offsets, offset = {}, 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    offsets[json.loads(line)['page_no']] = offset
+                except ValueError:
+                    # Blank or cut short by a crash; the batch is replayed on resume
+                    pass
+                offset += len(line)
+            for page_no in sorted(offsets):
+                f.seek(offsets[page_no])
+                yield json.loads(f.readline())
+
+    def begin(self, pdf_name):
+        # Re-ingesting a PDF replaces its chunks instead of duplicating them
+        open_text_store(self.client, self.embedder, pdf_name).delete_document(str(pdf_name))
+        self._remove_work_files(pdf_name)
+
+    def _remove_work_files(self, pdf_name):
+        for path in (self._pages_path(pdf_name), self._spill_path(pdf_name)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @METRICS.timed('store', op='write_batch')
+    def write_batch(self, pdf_name, batch):
+        if batch['chunks']:
+            open_text_store(self.client, self.embedder, pdf_name).add_chunks(
+                documents=batch['chunks'], metadatas=batch['metadatas'], ids=batch['ids'], embeddings=batch['embeddings'])
+        with open(self._pages_path(pdf_name), 'a') as f:
+            for page in batch['pages']:
+                f.write(json.dumps(page) + "\n")
+
+    def write_images(self, pdf_name, images):
+        if images:
+            open_image_store(self.client, pdf_name).add_chunks(**images)
+
+    @METRICS.timed('store', op='finish')
+    def finish(self, pdf_name):
+        # Streamed page by page, so long documents are never held in memory whole
+        pages = 0
+        with open(os.path.join(self.output_dir, f"{pdf_name}.json"), "w") as f:
+            f.write("[")
+            for page in self.iter_pages(pdf_name):
+                f.write(("\n" if not pages else ",\n") + json.dumps(page))
+                pages += 1
+            f.write("\n]\n")
+        self._remove_work_files(pdf_name)
+        # The lexical segment is rebuilt from the store, so resumed documents get all their chunks
+        ids, chunks, metadatas = open_text_store(self.client, self.embedder, pdf_name).get_document(str(pdf_name))
+        self.lexical_index.add_document(str(pdf_name), ids, chunks, metadatas)
+        bump_index_version()
+        return {'pages': pages, 'chunks': len(chunks)}
+
+    def index(self, pdf_path, pdf_name, on_page=None, start_page=1):
+        if start_page == 1:
+            self.begin(pdf_name)
+        for batch in self.iter_batches(pdf_path, pdf_name, start_page):
+            self.write_batch(pdf_name, batch)
+            if on_page:
+                on_page(batch['last_page'], batch['total_pages'])
+        images = self.image_batch(pdf_name)
+        self.write_images(pdf_name, images)
+        summary = self.finish(pdf_name)
+        summary['images'] = len(images['ids']) if images else 0
+        return summary
+
+    def close(self):
+        self.image_extractor.close()
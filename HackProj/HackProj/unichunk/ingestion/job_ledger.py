@@ -0,0 +1,98 @@
+# Job Ledger
+# SQLite record of batch ingestion progress: one row per PDF with its status
+# and the last page whose chunks reached the vector store, so an interrupted
+# run resumes each document after its last completed page. The app also uses
+# it as its ingestion queue: submitted documents wait as pending and the UI
+# polls their page progress. Only the process writing to the vector store
+# should start, checkpoint or finish jobs. Every row has an owner (the batch
+# CLI or the app), and each only picks up its own jobs, so opening the app
+# does not take over a crawl the CLI registered.
+import os
+import sqlite3
+import time
+
+from utils.config import INGEST_LEDGER_PATH
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+CLI, APP = 'cli', 'app'
+
+
+class JobLedger:
+    def __init__(self, path=INGEST_LEDGER_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        # Lets the UI poll progress while the writer is checkpointing
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS documents (
+            path TEXT PRIMARY KEY, pdf_name TEXT, size INTEGER, mtime REAL,
+            status TEXT, pages_total INTEGER DEFAULT 0, pages_done INTEGER DEFAULT 0,
+            chunks INTEGER DEFAULT 0, error TEXT, updated REAL, owner TEXT DEFAULT 'cli')""")
+        # Ledgers written before jobs had owners belonged to the CLI
+        if 'owner' not in [row[1] for row in self._db.execute("PRAGMA table_info(documents)")]:
+            self._db.execute("ALTER TABLE documents ADD COLUMN owner TEXT DEFAULT 'cli'")
+        self._db.commit()
+
+    def _update(self, path, **fields):
+        fields['updated'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        self._db.execute(f"UPDATE documents SET {columns} WHERE path = ?", list(fields.values()) + [path])
+        self._db.commit()
+
+    def register(self, path, pdf_name, owner=CLI):
+        # New files start pending; a file changed since it was recorded starts
+        # over, unless the other owner is ingesting it right now
+        stat = os.stat(path)
+        row = self._db.execute("SELECT size, mtime, status, owner FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            self._db.execute("INSERT INTO documents (path, pdf_name, size, mtime, status, updated, owner) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (path, pdf_name, stat.st_size, stat.st_mtime, PENDING, time.time(), owner))
+        elif row[:2] != (stat.st_size, stat.st_mtime) and not (row[2] == RUNNING and row[3] != owner):
+            self._update(path, pdf_name=pdf_name, size=stat.st_size, mtime=stat.st_mtime, status=PENDING,
+                         pages_total=0, pages_done=0, chunks=0, error=None, owner=owner)
+        self._db.commit()
+
+    def submit(self, path, pdf_name, owner=APP):
+        # Queues a document for (re-)ingestion by `owner`, unless it is being ingested right now
+        self.register(path, pdf_name, owner)
+        self._db.execute("UPDATE documents SET status = ?, pdf_name = ?, owner = ?, error = NULL, updated = ? WHERE path = ? AND status != ?",
+                         (PENDING, pdf_name, owner, time.time(), path, RUNNING))
+        self._db.commit()
+
+    def jobs(self, paths):
+        rows = self._db.execute(
+            f"SELECT path, pdf_name, status, pages_total, pages_done, chunks, error FROM documents WHERE path IN ({','.join('?' * len(paths))})",
+            list(paths)).fetchall()
+        columns = ('path', 'pdf_name', 'status', 'pages_total', 'pages_done', 'chunks', 'error')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def pending(self, owner, retry_failed=False):
+        # The owner's jobs; interrupted (running) documents come first, resuming where they stopped
+        statuses = (RUNNING, PENDING, FAILED) if retry_failed else (RUNNING, PENDING)
+        rows = self._db.execute(
+            f"SELECT path, pdf_name, pages_done, status FROM documents WHERE status IN ({','.join('?' * len(statuses))}) "
+            "AND owner = ? ORDER BY status = 'running' DESC, path", statuses + (owner,)).fetchall()
+        return [{'path': r[0], 'pdf_name': r[1], 'pages_done': r[2] if r[3] == RUNNING else 0} for r in rows]
+
+    def start(self, path, resume=False):
+        if resume:
+            self._update(path, status=RUNNING, error=None)
+        else:
+            self._update(path, status=RUNNING, pages_total=0, pages_done=0, chunks=0, error=None)
+
+    def page_done(self, path, last_page, total_pages, chunks):
+        self._db.execute("UPDATE documents SET pages_done = ?, pages_total = ?, chunks = chunks + ?, updated = ? WHERE path = ?",
+                         (last_page, total_pages, chunks, time.time(), path))
+        self._db.commit()
+
+    def finish(self, path):
+        self._update(path, status=DONE)
+
+    def fail(self, path, error):
+        self._update(path, status=FAILED, error=str(error)[:2000])
+
+    def summary(self):
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall())
+
+    def close(self):
+        self._db.close()
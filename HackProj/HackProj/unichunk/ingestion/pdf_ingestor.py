@@ -17,14 +17,6 @@ except ModuleNotFoundError:
     subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'pytesseract'])
     import pytesseract
 
-try:
-    from pdf2image import convert_from_path
-except ModuleNotFoundError:
-    import subprocess
-    import sys
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'pdf2image'])
-    from pdf2image import convert_from_path
-
 try:
     import spacy
 except ModuleNotFoundError:
@@ -37,6 +29,10 @@ from PIL import Image
 import numpy as np
 import cv2
 import os
+import threading
+
+from utils.metrics import METRICS
+from utils.config import OCR_DPI, MIN_OCR_REGION_AREA, MAX_TEXT_COVERAGE
 
 try:
     nlp = spacy.load("en_core_web_sm")
@@ -45,6 +41,10 @@ except:
     subprocess.check_call([sys.executable, '-m', 'spacy', 'download', 'en_core_web_sm'])
     nlp = spacy.load("en_core_web_sm")
 
+# spaCy pipelines are not documented as thread-safe, and the render_ocr and
+# layout stages OCR pages on several threads; tesseract itself runs outside this
+_nlp_lock = threading.Lock()
+
 class PDFIngestor:
     def __init__(self, pdf_path):
         self.pdf_path = pdf_path
@@ -55,10 +55,46 @@ class PDFIngestor:
         text = page.get_text().strip()
         return len(text) < 20
 
+    def image_regions(self, page):
+        # Image areas on a digital page that carry no native text (scanned figures, stamps, signatures)
+        text_rects = [fitz.Rect(b[:4]) for b in page.get_text("blocks") if b[6] == 0 and b[4].strip()]
+        regions = []
+        for info in page.get_image_info():
+            rect = fitz.Rect(info['bbox']) & page.rect
+            area = rect.get_area()
+            if rect.is_empty or area < MIN_OCR_REGION_AREA:
+                continue
+            covered = sum((rect & t).get_area() for t in text_rects)
+            if covered / area > MAX_TEXT_COVERAGE:
+                continue
+            if any(rect in r for r in regions):
+                continue
+            regions.append(rect)
+        return regions
+
+    def render_region(self, page, rect, dpi=OCR_DPI):
+        pix = page.get_pixmap(clip=rect, dpi=dpi)
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+    def ocr_image(self, image):
+        # Safe to call from several threads: tesseract runs as a subprocess and
+        # the spaCy pass is serialized
+        with METRICS.span('ocr'):
+            text = pytesseract.image_to_string(image).strip()
+        return self.extract_text_spacy(text)
+
+    def ocr_page(self, image):
+        # A scanned page is OCR'd whole, after turning it upright
+        return self.ocr_image(self.correct_orientation(image))
+
+    def close(self):
+        self.doc.close()
+
     def correct_orientation(self, image):
         # Use pytesseract to detect orientation
         try:
-            osd = pytesseract.image_to_osd(image)
+            with METRICS.span('osd'):
+                osd = pytesseract.image_to_osd(image)
             rotate = int([line for line in osd.split('\n') if 'Rotate:' in line][0].split(':')[1])
             if rotate != 0:
                 image = image.rotate(360 - rotate, expand=True)
@@ -67,23 +103,6 @@ class PDFIngestor:
         return image
 
     def extract_text_spacy(self, text):
-        doc = nlp(text)
+        with _nlp_lock, METRICS.span('spacy'):
+            doc = nlp(text)
         return doc.text
-
-    def extract_pages(self):
-        results = []
-        for i, page in enumerate(self.doc):
-            if self.is_scanned(page):
-                # Convert to image for OCR
-                images = convert_from_path(self.pdf_path, first_page=i+1, last_page=i+1, dpi=300)
-                image = images[0]
-                image = self.correct_orientation(image)
-                # Use pytesseract for OCR, then spaCy for text processing
-                raw_text = pytesseract.image_to_string(image)
-                processed_text = self.extract_text_spacy(raw_text)
-                results.append({'type': 'scanned', 'page_no': i+1, 'text': processed_text})
-            else:
-                text = page.get_text()
-                processed_text = self.extract_text_spacy(text)
-                results.append({'type': 'digital', 'page_no': i+1, 'text': processed_text})
-        return results
@@ -0,0 +1,51 @@
+# Chunk Provenance
+# Maps chunks back to where they came from on the page: fitz word boxes are
+# aligned to the extracted page text, and each chunk keeps the line boxes of
+# the words inside its character range. Boxes are stored in chunk metadata as
+# "x0,y0,x1,y1;..." strings, since Chroma metadata values must be scalars.
+
+
+def word_spans(page, text, offset=0):
+    # [(start, end, bbox, line_key)] for each fitz word found in `text`, in order.
+    # page.get_text() and the "words" output share their reading order, so a
+    # forward search keeps repeated words aligned to the right occurrence.
+    spans = []
+    cursor = 0
+    for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text('words'):
+        start = text.find(word, cursor)
+        if start < 0:
+            continue
+        cursor = start + len(word)
+        spans.append((offset + start, offset + cursor, (x0, y0, x1, y1), (block_no, line_no)))
+    return spans
+
+
+def region_spans(text, regions, cursor=0):
+    # OCR regions have no word boxes; their whole text maps to the region box
+    spans = []
+    for n, region in enumerate(regions):
+        start = text.find(region['text'], cursor)
+        if start < 0:
+            continue
+        cursor = start + len(region['text'])
+        spans.append((start, cursor, tuple(region['bbox']), ('ocr', n)))
+    return spans
+
+
+def chunk_boxes(spans, start, end):
+    # One box per text line (or OCR region) touched by [start, end)
+    boxes = {}
+    for span_start, span_end, (x0, y0, x1, y1), key in spans:
+        if span_end <= start or span_start >= end:
+            continue
+        box = boxes.get(key)
+        boxes[key] = (x0, y0, x1, y1) if box is None else (min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1))
+    return list(boxes.values())
+
+
+def format_boxes(boxes):
+    return ';'.join(','.join(f"{v:.1f}" for v in box) for box in boxes)
+
+
+def parse_boxes(value):
+    return [tuple(float(v) for v in box.split(',')) for box in value.split(';') if box] if value else []
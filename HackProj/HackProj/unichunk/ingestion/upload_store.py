@@ -0,0 +1,43 @@
+# Upload Store
+# Content-addressed storage for uploaded PDFs: each file is saved once as
+# <sha1>.pdf and skipped entirely when a file with the same content is stored.
+# Hashing and copying go in fixed-size chunks, so storing a file adds no
+# second full copy of it. That does not make uploads flat in memory: Streamlit
+# hands over an UploadedFile that is already a fully buffered BytesIO, so the
+# whole PDF is in RAM before store_upload runs (bounded by Streamlit's
+# server.maxUploadSize, 200 MB by default).
+import hashlib
+import os
+import shutil
+import tempfile
+
+from utils.config import UPLOAD_DIR, UPLOAD_CHUNK_SIZE
+
+
+def file_digest(fileobj, chunk_size=UPLOAD_CHUNK_SIZE):
+    digest = hashlib.sha1()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def store_upload(fileobj, root=UPLOAD_DIR, chunk_size=UPLOAD_CHUNK_SIZE):
+    # Returns the stored path; fileobj is any seekable binary file object
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"{file_digest(fileobj, chunk_size)}.pdf")
+    if os.path.exists(path):
+        return path
+    fd, tmp_path = tempfile.mkstemp(dir=root, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(fileobj, f, chunk_size)
+        # Readers only ever see complete files
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    finally:
+        fileobj.seek(0)
+    return path
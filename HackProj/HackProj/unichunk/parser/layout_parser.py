@@ -1,31 +1,42 @@
 # Layout Parsing & Content Element Detection
 # For digital: use pdfplumber; for scanned: use OpenCV
+# The pdfplumber handle stays open across pages (shared with the table
+# extractor); call close() when done with the document.
 
-import pdfplumber
 import cv2
 import numpy as np
 
+from parser.table_extractor import TableExtractor
+from utils.metrics import METRICS
+
 class LayoutParser:
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, tables=None):
         self.pdf_path = pdf_path
+        self.tables = tables or TableExtractor(pdf_path)
 
-    def parse_digital(self, page):
-        # Use pdfplumber to extract text, tables, images
+    def parse_digital(self, page, tables=True):
+        # Use pdfplumber to extract text, tables, images; tables=False leaves
+        # them to a separate table stage
         elements = []
-        with pdfplumber.open(self.pdf_path) as pdf:
-            p = pdf.pages[page]
-            # Text blocks
-            for block in p.extract_words():
-                bbox = block.get('bbox') if 'bbox' in block else [block.get('x0'), block.get('top'), block.get('x1'), block.get('bottom')]
-                elements.append({'type': 'text', 'bbox': bbox, 'text': block.get('text', '')})
-            # Tables
-            for table in p.extract_tables():
-                elements.append({'type': 'table', 'data': table})
-            # Images
-            for img in p.images:
-                elements.append({'type': 'image', 'bbox': img.get('bbox')})
+        with METRICS.span('pdfplumber'), self.tables.lock:
+            p = self.tables.pdf.pages[page]
+            try:
+                # Text blocks
+                for block in p.extract_words():
+                    bbox = block.get('bbox') if 'bbox' in block else [block.get('x0'), block.get('top'), block.get('x1'), block.get('bottom')]
+                    elements.append({'type': 'text', 'bbox': bbox, 'text': block.get('text', '')})
+                # Tables, only on pages with ruling lines
+                if tables:
+                    for table in self.tables.find(p):
+                        elements.append({'type': 'table', 'bbox': table['bbox'], 'rows': table['rows']})
+                # Images
+                for img in p.images:
+                    elements.append({'type': 'image', 'bbox': img.get('bbox')})
+            finally:
+                p.close()
         return elements
 
+    @METRICS.timed('layout_opencv')
     def parse_scanned(self, image):
         # Use OpenCV to detect contours, etc.
         elements = []
@@ -38,3 +49,6 @@ class LayoutParser:
             if w*h > 1000:
                 elements.append({'type': 'block', 'bbox': [x, y, x+w, y+h]})
         return elements
+
+    def close(self):
+        self.tables.close()
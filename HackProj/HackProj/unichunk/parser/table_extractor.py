@@ -0,0 +1,118 @@
+# Table Extraction
+# pdfplumber's table finder is one of the slowest steps in parsing, and with
+# its default (ruling line) strategy it cannot find a table on a page without
+# at least two horizontal and two vertical rules. Pages are screened on their
+# vector drawings first - with PyMuPDF during ingestion, or with the edges of
+# an already-parsed pdfplumber page - and only candidates are searched.
+# Tables come out as compact rows (empty rows and columns dropped) and are
+# chunked as pipe-separated text with the rows kept alongside.
+import json
+import threading
+
+from utils.metrics import METRICS
+from utils.config import TABLE_MIN_RULES, TABLE_MIN_RULE_LENGTH
+
+
+def _add_segment(counts, x0, y0, x1, y1, min_length):
+    if abs(y1 - y0) < 0.5 and abs(x1 - x0) >= min_length:
+        counts[0] += 1
+    elif abs(x1 - x0) < 0.5 and abs(y1 - y0) >= min_length:
+        counts[1] += 1
+
+
+def fitz_rule_counts(page, min_length=TABLE_MIN_RULE_LENGTH):
+    # (horizontal, vertical) rules among the page's lines and rectangle sides
+    counts = [0, 0]
+    for drawing in page.get_drawings():
+        for item in drawing['items']:
+            if item[0] == 'l':
+                _add_segment(counts, item[1].x, item[1].y, item[2].x, item[2].y, min_length)
+            elif item[0] == 're':
+                rect = item[1]
+                # A thin filled rectangle is a rule on its own
+                if rect.height < 0.5 or rect.width < 0.5:
+                    _add_segment(counts, rect.x0, rect.y0, rect.x1 if rect.height < 0.5 else rect.x0,
+                                 rect.y0 if rect.height < 0.5 else rect.y1, min_length)
+                    continue
+                for x0, y0, x1, y1 in ((rect.x0, rect.y0, rect.x1, rect.y0), (rect.x0, rect.y1, rect.x1, rect.y1),
+                                       (rect.x0, rect.y0, rect.x0, rect.y1), (rect.x1, rect.y0, rect.x1, rect.y1)):
+                    _add_segment(counts, x0, y0, x1, y1, min_length)
+    return tuple(counts)
+
+
+def plumber_rule_counts(page, min_length=TABLE_MIN_RULE_LENGTH):
+    counts = [0, 0]
+    for edge in page.edges:
+        _add_segment(counts, edge['x0'], edge['top'], edge['x1'], edge['bottom'], min_length)
+    return tuple(counts)
+
+
+def is_candidate(counts, min_rules=TABLE_MIN_RULES):
+    return counts[0] >= min_rules and counts[1] >= min_rules
+
+
+def compact_rows(rows):
+    rows = [[' '.join((cell or '').split()) for cell in row] for row in rows]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return []
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    keep = [i for i in range(width) if any(row[i] for row in rows)]
+    return [[row[i] for i in keep] for row in rows]
+
+
+def table_text(table):
+    return "\n".join(' | '.join(row) for row in table['rows'])
+
+
+def table_json(table):
+    return json.dumps(table['rows'], separators=(',', ':'))
+
+
+class TableExtractor:
+    # Keeps one pdfplumber handle per document; pdfplumber is not thread-safe,
+    # so every use of the handle holds the lock
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.lock = threading.RLock()
+        self._pdf = None
+        self.stats = {'screened': 0, 'candidates': 0, 'tables': 0}
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            import pdfplumber
+            self._pdf = pdfplumber.open(self.pdf_path)
+        return self._pdf
+
+    def find(self, page):
+        # Compact tables of an open pdfplumber page; pages without enough rules are skipped
+        self.stats['screened'] += 1
+        if not is_candidate(plumber_rule_counts(page)):
+            return []
+        self.stats['candidates'] += 1
+        tables = []
+        with METRICS.span('tables'):
+            for table in page.find_tables():
+                rows = compact_rows(table.extract())
+                if rows:
+                    tables.append({'bbox': [float(v) for v in table.bbox], 'rows': rows})
+        self.stats['tables'] += len(tables)
+        METRICS.inc('tables_total', len(tables))
+        return tables
+
+    def extract(self, page_index):
+        with self.lock:
+            page = self.pdf.pages[page_index]
+            try:
+                return self.find(page)
+            finally:
+                # pdfplumber keeps every parsed page's objects otherwise
+                page.close()
+
+    def close(self):
+        with self.lock:
+            if self._pdf is not None:
+                self._pdf.close()
+                self._pdf = None
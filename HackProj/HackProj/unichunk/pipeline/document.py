@@ -0,0 +1,164 @@
+# Document Pipeline
+# The ingestion stages for one PDF, run by the orchestrator:
+#   ingest -> classify -> render/OCR -> tables -> layout -> chunk -> batch -> embed
+# and handed to the caller batch by batch for the store stage, so one process
+# can stay the only writer. MuPDF objects are not thread-safe, so every fitz
+# call holds the document lock; tesseract, spaCy, chunking and embedding run
+# outside it and overlap across pages.
+import threading
+import time
+
+from ingestion.provenance import word_spans, region_spans
+from parser.table_extractor import TableExtractor, fitz_rule_counts, is_candidate
+from pipeline.orchestrator import Pipeline, Stage, Batch
+from utils.metrics import METRICS
+from utils.config import (PIPELINE_QUEUE_SIZE, PIPELINE_OCR_WORKERS, PIPELINE_CHUNK_WORKERS,
+                          PIPELINE_EMBED_WORKERS, PIPELINE_LAYOUT, PIPELINE_TABLES, OCR_DPI)
+
+
+class DocumentPipeline:
+    def __init__(self, indexer, pdf_path, pdf_name, start_page=1, layout=PIPELINE_LAYOUT, tables=PIPELINE_TABLES):
+        self.indexer = indexer
+        self.pdf_path = pdf_path
+        self.pdf_name = pdf_name
+        self.start_page = start_page
+        self.layout_enabled = layout
+        self.tables_enabled = tables
+        self._lock = threading.Lock()
+        self.ingestor = None
+        self.parser = None
+        self.tables = None
+        self.doc_hash = None
+
+    # --- stages ---
+
+    def ingest(self, item):
+        item['started'] = time.perf_counter()
+        with self._lock:
+            page = self.ingestor.doc[item['page_no'] - 1]
+            item['text'] = page.get_text()
+            # Word boxes aligned to the text, used for chunk provenance; dropped once chunked
+            item['spans'] = word_spans(page, item['text'])
+            item['images'] = self.indexer.image_extractor.extract_page(self.ingestor.doc, page)
+            if self.tables_enabled:
+                # Cheap pre-screen on vector drawings; only candidates reach pdfplumber
+                item['table_candidate'] = is_candidate(fitz_rule_counts(page))
+            cache = self.indexer.preview_cache
+            if self.doc_hash and cache.get(self.doc_hash, item['page_no']) is None:
+                # The page is already open, so its preview costs one render
+                cache.put_page(self.doc_hash, page)
+        return item
+
+    def classify(self, item):
+        with self._lock:
+            page = self.ingestor.doc[item['page_no'] - 1]
+            regions = self.ingestor.image_regions(page)
+            scanned = self.ingestor.is_scanned(page)
+        item['type'] = 'scanned' if scanned else ('mixed' if regions else 'digital')
+        item['regions'] = regions
+        return item
+
+    def render_ocr(self, item):
+        regions = item.pop('regions')
+        item['ocr_regions'] = []
+        if item['type'] == 'scanned':
+            return self.ocr_scanned(item)
+        for rect in regions:
+            with self._lock:
+                image = self.ingestor.render_region(self.ingestor.doc[item['page_no'] - 1], rect)
+            region_text = self.ingestor.ocr_image(image)
+            if region_text:
+                item['ocr_regions'].append({'bbox': [rect.x0, rect.y0, rect.x1, rect.y1], 'text': region_text})
+        if regions:
+            METRICS.inc('pages_ocr_total')
+            METRICS.inc('ocr_regions_total', len(regions))
+        if item['ocr_regions']:
+            native_len = len(item['text'])
+            item['text'] = "\n".join([item['text']] + [r['text'] for r in item['ocr_regions']])
+            item['spans'] += region_spans(item['text'], item['ocr_regions'], native_len)
+        return item
+
+    def ocr_scanned(self, item):
+        # The scan is the whole page, possibly fed in sideways: it is rendered,
+        # turned upright and OCR'd in one piece, replacing the (near empty)
+        # native text. Its chunks map to the page box
+        with self._lock:
+            page = self.ingestor.doc[item['page_no'] - 1]
+            rect = page.rect
+            image = self.ingestor.render_region(page, rect)
+        item['text'] = self.ingestor.ocr_page(image)
+        item['spans'] = region_spans(item['text'], [{'bbox': [rect.x0, rect.y0, rect.x1, rect.y1], 'text': item['text']}])
+        METRICS.inc('pages_ocr_total')
+        return item
+
+    def find_tables(self, item):
+        # Scanned pages have no ruling lines to find
+        if item.pop('table_candidate', False) and item['type'] != 'scanned':
+            item['tables'] = self.tables.extract(item['page_no'] - 1)
+        return item
+
+    def layout(self, item):
+        if item['type'] == 'scanned':
+            with self._lock:
+                page = self.ingestor.doc[item['page_no'] - 1]
+                image = self.ingestor.render_region(page, page.rect, OCR_DPI)
+            item['elements'] = self.parser.parse_scanned(image)
+        else:
+            item['elements'] = self.parser.parse_digital(item['page_no'] - 1, tables=not self.tables_enabled)
+            item['elements'] += [{'type': 'table', 'bbox': t['bbox'], 'rows': t['rows']} for t in item.get('tables', [])]
+        return item
+
+    def chunk(self, item):
+        item['chunks'], item['metadatas'] = self.indexer.chunk_page(item, self.pdf_name)
+        # Per-page span from the start of extraction to chunked, queue waits included
+        seconds = time.perf_counter() - item.pop('started')
+        METRICS.observe('page_seconds', seconds)
+        METRICS.record('page', seconds, pdf_name=self.pdf_name, page_no=item['page_no'], type=item['type'])
+        METRICS.inc('pages_total', type=item['type'])
+        METRICS.inc('chunks_total', len(item['chunks']))
+        return item
+
+    def embed(self, pages):
+        return self.indexer.make_batch(pages, self.pdf_name, self.total_pages)
+
+    # --- running ---
+
+    def stages(self):
+        stages = [
+            Stage('ingest', self.ingest),
+            Stage('classify', self.classify),
+            Stage('render_ocr', self.render_ocr, PIPELINE_OCR_WORKERS),
+        ]
+        if self.tables_enabled:
+            # One worker: the pdfplumber handle is used by one thread at a time anyway
+            stages.append(Stage('tables', self.find_tables))
+        if self.layout_enabled:
+            stages.append(Stage('layout', self.layout, PIPELINE_OCR_WORKERS))
+        stages += [
+            Stage('chunk', self.chunk, PIPELINE_CHUNK_WORKERS),
+            Batch('batch', self.indexer.page_batch, close_after=lambda item: item['page_no'] == self.total_pages),
+            Stage('embed', self.embed, PIPELINE_EMBED_WORKERS),
+        ]
+        return stages
+
+    def run(self):
+        # Yields the document's batches in page order
+        from ingestion.pdf_ingestor import PDFIngestor
+        self.ingestor = PDFIngestor(self.pdf_path)
+        try:
+            self.total_pages = len(self.ingestor.doc)
+            if self.indexer.preview_cache:
+                self.doc_hash = self.indexer.preview_cache.document_hash(self.pdf_path)
+            if self.tables_enabled or self.layout_enabled:
+                self.tables = TableExtractor(self.pdf_path)
+            if self.layout_enabled:
+                from parser.layout_parser import LayoutParser
+                self.parser = LayoutParser(self.pdf_path, self.tables)
+            pages = ({'page_no': n} for n in range(self.start_page, self.total_pages + 1))
+            with METRICS.span('document', attrs={'pdf_name': self.pdf_name, 'pages': self.total_pages - self.start_page + 1}):
+                yield from Pipeline(self.stages(), PIPELINE_QUEUE_SIZE).run(pages)
+        finally:
+            self.ingestor.close()
+            if self.tables is not None:
+                self.tables.close()
+            self.indexer.image_extractor.flush()
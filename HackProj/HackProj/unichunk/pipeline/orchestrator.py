@@ -0,0 +1,161 @@
+# Pipeline Orchestrator
+# Runs items through a chain of stages connected by bounded queues. Every
+# stage has its own worker threads, so a slow stage can be widened on its own,
+# and a full queue blocks the stage feeding it (backpressure) instead of
+# letting pages pile up in memory. Items are numbered at the source; Batch
+# restores that order and groups items, and results leave in source order.
+import queue
+import threading
+
+from utils.metrics import METRICS
+
+_END = object()
+
+
+class Stage:
+    # fn(item) returns the item to pass on, or None to drop it
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+
+class Batch:
+    # Regroups items in source order: a batch closes after `size` items or when
+    # close_after(item) says so (e.g. on the last page of a document)
+    def __init__(self, name, size, close_after=None):
+        self.name = name
+        self.size = size
+        self.close_after = close_after
+        self.workers = 1
+
+
+class PipelineError(Exception):
+    pass
+
+
+class Pipeline:
+    def __init__(self, stages, queue_size=4):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.error = None
+        self._abort = threading.Event()
+
+    def _put(self, q, value):
+        while not self._abort.is_set():
+            try:
+                q.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, stage, e):
+        if self.error is None:
+            self.error = PipelineError(f"{stage.name}: {type(e).__name__}: {e}")
+            self.error.__cause__ = e
+        self._abort.set()
+
+    def _source(self, items, out):
+        try:
+            for seq, item in enumerate(items):
+                if not self._put(out, (seq, item)):
+                    return
+        except Exception as e:
+            self._fail(Stage('source', None), e)
+        self._put(out, _END)
+
+    def _worker(self, stage, inbox, out, remaining):
+        while True:
+            entry = self._get(inbox)
+            if entry is _END:
+                # Let sibling workers see the end too; the last one passes it on
+                self._put(inbox, _END)
+                with remaining['lock']:
+                    remaining['count'] -= 1
+                    last = remaining['count'] == 0
+                if last:
+                    self._put(out, _END)
+                return
+            seq, item = entry
+            if item is None:
+                # Dropped by an earlier stage; only its sequence number moves on
+                self._put(out, entry)
+                continue
+            try:
+                with METRICS.span('pipeline_stage', stage=stage.name):
+                    result = stage.fn(item)
+            except Exception as e:
+                self._fail(stage, e)
+                continue
+            if result is not None:
+                self._put(out, (seq, result))
+            else:
+                # Dropped items still advance the sequence for reordering
+                self._put(out, (seq, None))
+
+    def _batcher(self, stage, inbox, out):
+        pending, next_seq, batch, batch_no = {}, 0, [], 0
+        while True:
+            entry = self._get(inbox)
+            if entry is _END:
+                break
+            pending[entry[0]] = entry[1]
+            while next_seq in pending:
+                item = pending.pop(next_seq)
+                next_seq += 1
+                if item is None:
+                    continue
+                batch.append(item)
+                if len(batch) >= stage.size or (stage.close_after and stage.close_after(item)):
+                    if not self._put(out, (batch_no, batch)):
+                        return
+                    batch, batch_no = [], batch_no + 1
+        if batch and not self._abort.is_set():
+            self._put(out, (batch_no, batch))
+        self._put(out, _END)
+
+    def run(self, items):
+        # Yields the last stage's results in source order
+        self.error = None
+        self._abort.clear()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._source, args=(items, queues[0]), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            if isinstance(stage, Batch):
+                threads.append(threading.Thread(target=self._batcher, args=(stage, queues[i], queues[i + 1]),
+                                                name=stage.name, daemon=True))
+                continue
+            remaining = {'count': stage.workers, 'lock': threading.Lock()}
+            for n in range(stage.workers):
+                threads.append(threading.Thread(target=self._worker, args=(stage, queues[i], queues[i + 1], remaining),
+                                                name=f"{stage.name}-{n}", daemon=True))
+        for thread in threads:
+            thread.start()
+        pending, next_seq = {}, 0
+        try:
+            while True:
+                entry = self._get(queues[-1])
+                if entry is _END:
+                    break
+                pending[entry[0]] = entry[1]
+                while next_seq in pending:
+                    result = pending.pop(next_seq)
+                    next_seq += 1
+                    if result is not None:
+                        yield result
+        finally:
+            # Stops the stages if the consumer gives up early
+            self._abort.set()
+            for thread in threads:
+                thread.join()
+        if self.error is not None:
+            raise self.error
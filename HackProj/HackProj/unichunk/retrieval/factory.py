@@ -0,0 +1,39 @@
+# Retrieval factory
+# Opens the Chroma stores for the configured collection layout and assembles
+# the retriever stack, shared by the app, the CLI tools and the benchmarks
+from utils.config import CHROMA_PERSIST_DIR, COLLECTION_LAYOUT, UNIFIED_COLLECTION_NAME, HYBRID_RETRIEVAL
+
+
+def open_client(persist_directory=CHROMA_PERSIST_DIR):
+    # chromadb >= 0.4 keeps a plain Client in memory unless it is marked
+    # persistent; the CLI, the app and the ledger all rely on the index on disk
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb.Client(Settings(persist_directory=persist_directory, is_persistent=True, anonymized_telemetry=False))
+
+
+def open_text_store(client, embedder, collection_name=None, layout=COLLECTION_LAYOUT):
+    from embedding.text_embedder import TextEmbeddingFunction
+    from vector_store.store_chroma import ChromaStore
+    name = UNIFIED_COLLECTION_NAME if layout == 'unified' else collection_name
+    return ChromaStore(client=client, collection_name=name, embedding_function=TextEmbeddingFunction(embedder))
+
+
+def open_image_store(client, collection_name=None, layout=COLLECTION_LAYOUT):
+    from vector_store.store_chroma import ChromaStore
+    name = UNIFIED_COLLECTION_NAME if layout == 'unified' else collection_name
+    return ChromaStore(client=client, collection_name=f"{name}_images", metadata={"hnsw:space": "cosine"})
+
+
+def build_retriever(client, embedder, pdf_names, lexical_index=None, layout=COLLECTION_LAYOUT, hybrid=HYBRID_RETRIEVAL):
+    if layout == 'unified':
+        from retrieval.unified import UnifiedRetriever
+        retriever = UnifiedRetriever(open_text_store(client, embedder, layout=layout), embedder, pdf_names=pdf_names)
+    else:
+        from retrieval.fanout import FanoutRetriever
+        retriever = FanoutRetriever([open_text_store(client, embedder, name, layout).collection for name in pdf_names], embedder)
+    if hybrid:
+        from retrieval.hybrid import HybridRetriever
+        from retrieval.lexical_index import LexicalIndex
+        retriever = HybridRetriever(retriever, lexical_index or LexicalIndex(), pdf_names=pdf_names)
+    return retriever
@@ -0,0 +1,63 @@
+# Fan-out Retrieval
+# Embeds the query once and searches every collection concurrently,
+# merging the per-collection hits into a single global top-k by distance
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.config import RETRIEVAL_TOP_K, RETRIEVAL_WORKERS
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool():
+    # One pool per process: the Streamlit app builds a retriever on every rerun
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix='retrieval')
+        return _pool
+
+
+def to_hits(results, collection_name):
+    # Every retriever returns hits with these keys. 'distance' is the vector
+    # distance and 'score' the BM25 score, None where a hit has no such
+    # ranking; 'collection' is the document's own (per-PDF) collection name,
+    # also when it was found in the unified collection
+    return [{
+        'id': doc_id,
+        'document': doc,
+        'metadata': meta,
+        'distance': dist,
+        'score': None,
+        'collection': (meta or {}).get('pdf_name', collection_name)
+    } for doc_id, doc, meta, dist in zip(results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0])]
+
+
+class FanoutRetriever:
+    def __init__(self, collections, embedder, pool=None):
+        self.collections = list(collections)
+        self.embedder = embedder
+        self._pool = pool or _shared_pool()
+
+    def embed_query(self, text):
+        return self.embedder.embed([text])[0]
+
+    def _query_collection(self, collection, embedding, n_results):
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=['documents', 'metadatas', 'distances']
+        )
+        return to_hits(results, collection.name)
+
+    def query(self, text=None, k=RETRIEVAL_TOP_K, per_collection_k=None, embedding=None):
+        if embedding is None:
+            embedding = self.embed_query(text)
+        embedding = [float(x) for x in embedding]
+        futures = [self._pool.submit(self._query_collection, c, embedding, per_collection_k or k) for c in self.collections]
+        hits = []
+        for future in futures:
+            hits.extend(future.result())
+        return heapq.nsmallest(k, hits, key=lambda h: h['distance'])
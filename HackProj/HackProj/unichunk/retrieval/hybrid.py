@@ -0,0 +1,37 @@
+# Hybrid Retrieval
+# Runs BM25 over the lexical index alongside the dense retriever and merges the
+# two rankings with reciprocal-rank fusion, so exact identifiers (part numbers,
+# regulation and clause IDs) are found even when the embedding misses them
+from retrieval.fanout import _shared_pool
+from retrieval.lexical_index import reciprocal_rank_fusion
+from utils.config import RETRIEVAL_TOP_K, HYBRID_CANDIDATES
+
+
+class HybridRetriever:
+    def __init__(self, dense, lexical, pdf_names=None, candidates=HYBRID_CANDIDATES):
+        self.dense = dense
+        self.lexical = lexical
+        self.pdf_names = list(pdf_names) if pdf_names else None
+        self.candidates = candidates
+        self.embedder = dense.embedder
+
+    def embed_query(self, text):
+        return self.dense.embed_query(text)
+
+    def query(self, text=None, k=RETRIEVAL_TOP_K, embedding=None):
+        lexical_future = _shared_pool().submit(self.lexical.search, text, self.candidates, self.pdf_names) if text else None
+        dense_hits = self.dense.query(text, k=max(k, self.candidates), embedding=embedding)
+        lexical_hits = lexical_future.result() if lexical_future else []
+        dense_by_id = {hit['id']: hit for hit in dense_hits}
+        lexical_by_id = {hit['id']: hit for hit in lexical_hits}
+        fused = reciprocal_rank_fusion([[h['id'] for h in dense_hits], [h['id'] for h in lexical_hits]])
+        hits = []
+        for doc_id, score in fused[:k]:
+            # Same keys whichever side found the chunk: distance is None for
+            # BM25-only hits, score is None for dense-only hits
+            hit = dict(dense_by_id.get(doc_id) or lexical_by_id[doc_id])
+            if doc_id in lexical_by_id:
+                hit['score'] = lexical_by_id[doc_id]['score']
+            hit['rrf_score'] = score
+            hits.append(hit)
+        return hits
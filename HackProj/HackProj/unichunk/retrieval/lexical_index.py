@@ -0,0 +1,193 @@
+# Lexical Index
+# BM25 inverted index over the same chunks that go into the vector store.
+# One segment per document, written as numpy arrays that are memory-mapped on
+# load: postings hold delta-encoded chunk numbers (uint16 where they fit) and
+# term frequencies, terms.json maps each term to its postings slice.
+# Collection statistics (N, avgdl, df) are summed over the segments searched.
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+
+from utils.config import LEXICAL_INDEX_DIR, BM25_K1, BM25_B, RRF_K
+
+# Keeps identifiers such as 2017/745, MDCG-2019-11 or 10.2 together
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[./\-][a-z0-9]+)*")
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            # Also index the parts, so "745" finds "2017/745"
+            tokens.extend(re.split(r"[./\-]", token))
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    # rankings: lists of ids, best first. Returns [(id, score)] best first.
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def write_segment(path, ids, texts, metadatas):
+    postings = {}
+    doc_lens = np.zeros(len(texts), dtype=np.uint32)
+    for doc_no, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lens[doc_no] = len(tokens)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            postings.setdefault(token, []).append((doc_no, tf))
+    doc_dtype = np.uint16 if len(texts) < 2 ** 16 else np.uint32
+    terms = {}
+    doc_parts, tf_parts = [], []
+    offset = 0
+    for term in sorted(postings):
+        entries = postings[term]
+        docs = np.array([d for d, _ in entries], dtype=np.int64)
+        doc_parts.append(np.diff(docs, prepend=0).astype(doc_dtype))
+        tf_parts.append(np.minimum([tf for _, tf in entries], 2 ** 16 - 1).astype(np.uint16))
+        terms[term] = [offset, len(entries)]
+        offset += len(entries)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, 'docs.npy'), np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=doc_dtype))
+    np.save(os.path.join(tmp_path, 'tfs.npy'), np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.uint16))
+    np.save(os.path.join(tmp_path, 'doc_lens.npy'), doc_lens)
+    with open(os.path.join(tmp_path, 'terms.json'), 'w') as f:
+        json.dump(terms, f, separators=(',', ':'))
+    with open(os.path.join(tmp_path, 'chunks.json'), 'w') as f:
+        json.dump({'ids': ids, 'documents': texts, 'metadatas': metadatas}, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def _stamp(path):
+    # A rewritten segment is a new directory (write_segment swaps it in whole),
+    # so its inode and mtime tell whether a cached Segment is still current
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+class Segment:
+    def __init__(self, path):
+        self.path = path
+        self.stamp = _stamp(path)
+        self.docs = np.load(os.path.join(path, 'docs.npy'), mmap_mode='r')
+        self.tfs = np.load(os.path.join(path, 'tfs.npy'), mmap_mode='r')
+        self.doc_lens = np.load(os.path.join(path, 'doc_lens.npy'), mmap_mode='r')
+        with open(os.path.join(path, 'terms.json')) as f:
+            self.terms = json.load(f)
+        self._chunks = None
+
+    @property
+    def chunks(self):
+        if self._chunks is None:
+            with open(os.path.join(self.path, 'chunks.json')) as f:
+                self._chunks = json.load(f)
+        return self._chunks
+
+    def postings(self, term):
+        entry = self.terms.get(term)
+        if entry is None:
+            return None, None
+        start, count = entry
+        docs = np.cumsum(self.docs[start:start + count], dtype=np.int64)
+        return docs, self.tfs[start:start + count].astype(np.float32)
+
+
+class LexicalIndex:
+    def __init__(self, root=LEXICAL_INDEX_DIR, k1=BM25_K1, b=BM25_B):
+        self.root = root
+        self.k1 = k1
+        self.b = b
+        os.makedirs(root, exist_ok=True)
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def _segment_path(self, pdf_name):
+        return os.path.join(self.root, re.sub(r'[^a-zA-Z0-9._-]', '_', pdf_name))
+
+    def add_document(self, pdf_name, ids, texts, metadatas):
+        write_segment(self._segment_path(pdf_name), list(ids), list(texts), list(metadatas))
+        with self._lock:
+            self._segments.pop(pdf_name, None)
+
+    def delete_document(self, pdf_name):
+        shutil.rmtree(self._segment_path(pdf_name), ignore_errors=True)
+        with self._lock:
+            self._segments.pop(pdf_name, None)
+
+    def documents(self):
+        return sorted(name for name in os.listdir(self.root) if not name.endswith('.tmp'))
+
+    def segment(self, pdf_name):
+        # Another process (the batch CLI, or the app's ingest service with its
+        # own LexicalIndex) may have rewritten or deleted the segment since it
+        # was mapped, so the cached one is checked against the directory
+        path = self._segment_path(pdf_name)
+        stamp = _stamp(path)
+        with self._lock:
+            seg = self._segments.get(pdf_name)
+            if seg is not None and seg.stamp == stamp:
+                return seg
+            self._segments.pop(pdf_name, None)
+            if stamp is None:
+                return None
+            seg = self._segments[pdf_name] = Segment(path)
+            return seg
+
+    def search(self, query, k=10, pdf_names=None):
+        names = pdf_names if pdf_names is not None else self.documents()
+        segments = [(name, seg) for name, seg in ((n, self.segment(n)) for n in names) if seg is not None]
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not segments or not terms:
+            return []
+        total_docs = sum(len(seg.doc_lens) for _, seg in segments)
+        avgdl = max(sum(float(np.sum(seg.doc_lens)) for _, seg in segments) / max(total_docs, 1), 1.0)
+        df = {t: sum(seg.terms[t][1] for _, seg in segments if t in seg.terms) for t in terms}
+        candidates = []
+        for name, seg in segments:
+            scores = None
+            norm = self.k1 * (1 - self.b + self.b * np.asarray(seg.doc_lens, dtype=np.float32) / avgdl)
+            for term in terms:
+                docs, tfs = seg.postings(term)
+                if docs is None:
+                    continue
+                idf = np.log(1 + (total_docs - df[term] + 0.5) / (df[term] + 0.5))
+                if scores is None:
+                    scores = np.zeros(len(seg.doc_lens), dtype=np.float32)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+            if scores is None:
+                continue
+            hit_docs = np.nonzero(scores)[0]
+            if len(hit_docs) > k:
+                hit_docs = hit_docs[np.argpartition(-scores[hit_docs], k)[:k]]
+            candidates.extend((float(scores[d]), name, seg, int(d)) for d in hit_docs)
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        hits = []
+        for score, name, seg, doc_no in candidates[:k]:
+            chunks = seg.chunks
+            hits.append({
+                'id': chunks['ids'][doc_no],
+                'document': chunks['documents'][doc_no],
+                'metadata': chunks['metadatas'][doc_no],
+                'distance': None,
+                'score': score,
+                'collection': name
+            })
+        return hits
@@ -0,0 +1,69 @@
+# Query Builder
+# Builds the retrieval query from the current question rather than the whole
+# chat transcript. Follow-up questions ("what about its annex?") borrow key
+# terms from the previous user turn, and the previous turns' embeddings, which
+# the embedding cache already holds, can optionally be blended in.
+import re
+
+import numpy as np
+
+from utils.config import QUERY_REWRITE, QUERY_HISTORY_WEIGHT, QUERY_HISTORY_TURNS
+
+STOPWORDS = set("""
+a an the and or but if of to in on at by for with from as is are was were be been being do does did
+what which who whom whose when where why how this that these those it its they them their there
+i me my we our you your he she his her can could should would will shall may might must about
+please tell explain describe give list show any some all more most other such than then so not no
+say says said mean means
+""".split())
+REFERENCE_WORDS = {'it', 'its', 'this', 'that', 'these', 'those', 'they', 'them', 'their', 'he', 'she', 'his', 'her', 'above', 'same'}
+FOLLOW_UP_PREFIXES = ('and ', 'also ', 'what about', 'how about', 'what else', 'why', 'how so')
+# "Does it ...", "Is this ...": a reference word right after one of these still opens the question
+LEAD_WORDS = {'does', 'do', 'did', 'is', 'are', 'was', 'were', 'can', 'could', 'should', 'would', 'will', 'and', 'but', 'so'}
+# Questions this short with a reference word lean on the previous turn
+SHORT_QUESTION_WORDS = 6
+
+
+def content_terms(text, limit=8):
+    terms = [t for t in re.findall(r"[A-Za-z0-9][A-Za-z0-9./\-]*", text) if t.lower() not in STOPWORDS]
+    return list(dict.fromkeys(terms))[:limit]
+
+
+def is_follow_up(question):
+    # A reference word deeper in a longer question ("what does this regulation
+    # require") usually points into the question itself, so only an opening
+    # anaphor or a short question counts
+    words = re.findall(r"[a-z0-9']+", question.lower())
+    if len(words) <= 3:
+        return True
+    if question.lower().lstrip().startswith(FOLLOW_UP_PREFIXES):
+        return True
+    if words[0] in REFERENCE_WORDS or (words[0] in LEAD_WORDS and words[1] in REFERENCE_WORDS):
+        return True
+    return len(words) <= SHORT_QUESTION_WORDS and any(w in REFERENCE_WORDS for w in words)
+
+
+class QueryBuilder:
+    def __init__(self, embedder, rewrite=QUERY_REWRITE, history_weight=QUERY_HISTORY_WEIGHT, history_turns=QUERY_HISTORY_TURNS):
+        self.embedder = embedder
+        self.rewrite = rewrite
+        self.history_weight = history_weight
+        self.history_turns = history_turns
+
+    def rewrite_question(self, question, history):
+        if not self.rewrite or not history or not is_follow_up(question):
+            return question
+        own = {t.lower() for t in content_terms(question)}
+        borrowed = [t for t in content_terms(history[-1]) if t.lower() not in own]
+        return f"{question} {' '.join(borrowed)}".strip()
+
+    def build(self, question, history=()):
+        # history: previous user questions, oldest first
+        history = list(history)
+        text = self.rewrite_question(question, history)
+        embedding = self.embedder.embed([text])[0]
+        if self.history_weight > 0 and history:
+            previous = self.embedder.embed(history[-self.history_turns:])
+            embedding = embedding + self.history_weight * previous.mean(axis=0)
+            embedding = embedding / max(np.linalg.norm(embedding), 1e-12)
+        return {'text': text, 'embedding': embedding}
@@ -0,0 +1,101 @@
+# Query Cache
+# Layered answer cache for the chat block: an exact layer keyed by the normalized
+# question, the documents searched and the index version, and a semantic layer
+# that reuses an answer when a new question embeds close enough to a cached one.
+# Entries expire after a TTL, the least recently used are evicted at capacity,
+# and everything is dropped when the index version changes.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embedding.embedding_cache import normalize_text
+from utils.config import QUERY_CACHE_CAPACITY, QUERY_CACHE_TTL, QUERY_CACHE_SEMANTIC_THRESHOLD
+from utils.index_version import read_index_version
+from utils.metrics import METRICS
+
+
+class QueryCache:
+    def __init__(self, capacity=QUERY_CACHE_CAPACITY, ttl=QUERY_CACHE_TTL, semantic_threshold=QUERY_CACHE_SEMANTIC_THRESHOLD):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @staticmethod
+    def scope(collections):
+        return ','.join(sorted(collections))
+
+    def key(self, query, collections):
+        return hashlib.sha1(f"{normalize_text(query).lower()}\0{self.scope(collections)}".encode('utf-8')).hexdigest()
+
+    def _sync_version(self):
+        version = read_index_version()
+        if version != self._version:
+            if self._entries:
+                self.stats['invalidations'] += 1
+            self._entries.clear()
+            self._version = version
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry['created'] > self.ttl
+
+    def get(self, query, collections, embedding=None):
+        now = time.time()
+        key = self.key(query, collections)
+        with self._lock:
+            self._sync_version()
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['exact_hits'] += 1
+                METRICS.inc('query_cache_hits_total', kind='exact')
+                return entry['value']
+            if embedding is not None and self.semantic_threshold is not None:
+                scope = self.scope(collections)
+                candidates = [(k, e) for k, e in self._entries.items()
+                              if e['scope'] == scope and e['embedding'] is not None and not self._expired(e, now)]
+                if candidates:
+                    query_vec = np.asarray(embedding, dtype=np.float32)
+                    query_vec = query_vec / max(np.linalg.norm(query_vec), 1e-12)
+                    sims = np.stack([e['embedding'] for _, e in candidates]) @ query_vec
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.semantic_threshold:
+                        best_key, best_entry = candidates[best]
+                        self._entries.move_to_end(best_key)
+                        self.stats['semantic_hits'] += 1
+                        METRICS.inc('query_cache_hits_total', kind='semantic')
+                        return best_entry['value']
+            self.stats['misses'] += 1
+            METRICS.inc('query_cache_misses_total')
+            return None
+
+    def put(self, query, collections, value, embedding=None):
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32)
+            embedding = embedding / max(np.linalg.norm(embedding), 1e-12)
+        with self._lock:
+            self._sync_version()
+            key = self.key(query, collections)
+            self._entries[key] = {
+                'created': time.time(),
+                'scope': self.scope(collections),
+                'embedding': embedding,
+                'value': value
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats['invalidations'] += 1
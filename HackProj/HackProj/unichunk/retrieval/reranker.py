@@ -0,0 +1,43 @@
+# Cross-encoder Reranker
+# Rescores retrieved candidates against the question in small batches and stops
+# when the next batch would overrun the time budget; candidates it did not get
+# to keep their retrieval order behind the scored ones
+import time
+
+from utils.config import RERANK_MODEL, RERANK_BATCH_SIZE, RERANK_TIME_BUDGET, RERANK_TOP_K
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE, time_budget=RERANK_TIME_BUDGET):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device='cpu', max_length=512)
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.last_stats = {}
+
+    def rerank(self, query, hits, top_k=RERANK_TOP_K):
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        scored = []
+        batch_seconds = 0.0
+        pos = 0
+        while pos < len(hits):
+            now = time.perf_counter()
+            if scored and now + batch_seconds > deadline:
+                break
+            batch = hits[pos:pos + self.batch_size]
+            scores = self.model.predict([(query, hit['document']) for hit in batch], batch_size=len(batch))
+            batch_seconds = max(batch_seconds, time.perf_counter() - now)
+            for hit, score in zip(batch, scores):
+                hit = dict(hit)
+                hit['rerank_score'] = float(score)
+                scored.append(hit)
+            pos += len(batch)
+        ranked = sorted(scored, key=lambda h: h['rerank_score'], reverse=True) + hits[pos:]
+        self.last_stats = {
+            'candidates': len(hits),
+            'scored': len(scored),
+            'seconds': time.perf_counter() - start,
+            'truncated': pos < len(hits)
+        }
+        return ranked[:top_k]
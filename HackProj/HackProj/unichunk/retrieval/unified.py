@@ -0,0 +1,22 @@
+# Unified Retrieval
+# Single ANN search over the shared collection, restricted to the selected
+# documents with a pdf_name metadata filter
+from retrieval.fanout import to_hits
+from utils.config import RETRIEVAL_TOP_K
+
+
+class UnifiedRetriever:
+    def __init__(self, store, embedder, pdf_names=None):
+        self.store = store
+        self.embedder = embedder
+        self.pdf_names = list(pdf_names) if pdf_names else None
+
+    def embed_query(self, text):
+        return self.embedder.embed([text])[0]
+
+    def query(self, text=None, k=RETRIEVAL_TOP_K, embedding=None, pdf_names=None):
+        if embedding is None:
+            embedding = self.embed_query(text)
+        embedding = [float(x) for x in embedding]
+        results = self.store.query(embedding, top_k=k, pdf_names=pdf_names or self.pdf_names)
+        return to_hits(results, self.store.collection.name)
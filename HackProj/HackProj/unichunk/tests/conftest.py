@@ -0,0 +1,7 @@
+# Test setup
+# Modules import each other by top-level package (ingestion, utils, ...), as
+# when the app or the CLI runs from this directory
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,58 @@
+# Batch ingestion: worker processes only read the embedding cache, and the
+# vectors they compute are stored by the ingester, so a text ingested a
+# second time never reaches the model
+import pytest
+
+pytest.importorskip('cv2')
+pytest.importorskip('sentence_transformers')
+
+from benchmarks.synthetic_corpus import make_pdf
+from ingestion.batch_ingest import BatchIngester
+from ingestion.job_ledger import JobLedger
+from utils.metrics import METRICS
+
+
+class Writer:
+    # Keeps batches in memory instead of writing them to Chroma
+    def __init__(self):
+        self.chunks = {}
+
+    def begin(self, pdf_name):
+        self.chunks[pdf_name] = []
+
+    def write_batch(self, pdf_name, batch):
+        self.chunks[pdf_name] += batch['chunks']
+
+    def write_images(self, pdf_name, images):
+        pass
+
+    def finish(self, pdf_name):
+        pass
+
+
+def embedded():
+    return sum(value for (name, _), value in METRICS.counters.items() if name == 'chunks_embedded_total')
+
+
+def ingest(ingester, ledger, path, pdf_name):
+    ledger.submit(path, pdf_name)
+    for job in ledger.pending('app'):
+        ingester.submit(job)
+    while ingester.active:
+        ingester.step(0.5)
+
+
+def test_second_ingest_of_the_same_text_skips_the_model(tmp_path):
+    path = make_pdf(str(tmp_path / 'doc.pdf'), 'digital', 2)
+    ledger = JobLedger(str(tmp_path / 'ledger.sqlite'))
+    writer = Writer()
+    with BatchIngester(ledger, writer, workers=1, embed_images=False, cache_dir=str(tmp_path / 'cache')) as ingester:
+        before = embedded()
+        ingest(ingester, ledger, path, 'first')
+        first = embedded() - before
+        ingest(ingester, ledger, path, 'second')
+        second = embedded() - before - first
+    ledger.close()
+    assert writer.chunks['first'] and writer.chunks['second'] == writer.chunks['first']
+    assert first > 0
+    assert second == 0
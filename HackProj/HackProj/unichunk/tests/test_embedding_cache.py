@@ -0,0 +1,75 @@
+# Embedding cache: LRU order has to survive closing and reopening the cache
+import numpy as np
+
+from embedding.embedding_cache import EmbeddingCache
+
+
+def vec(value, dim=4):
+    return np.full(dim, value, dtype=np.float32)
+
+
+def test_get_and_put_roundtrip(tmp_path):
+    cache = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=4)
+    cache.put_many(['a b', 'c'], [vec(1), vec(2)])
+    # Keys are whitespace-normalized
+    hits = cache.get_many(['a   b', 'c', 'missing'])
+    assert np.allclose(hits[0], vec(1)) and np.allclose(hits[1], vec(2)) and hits[2] is None
+    cache.close()
+
+
+def test_lru_order_survives_reopen(tmp_path):
+    cache = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=3)
+    cache.put_many(['a', 'b', 'c'], [vec(1), vec(2), vec(3)])
+    # Push the stored clock well past the number of entries
+    for _ in range(10):
+        cache.get_many(['b', 'c'])
+    cache.close()
+
+    cache = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=3)
+    # 'a' is now the most recently used; 'b' is the oldest
+    cache.get_many(['c'])
+    cache.get_many(['a'])
+    cache.close()
+
+    cache = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=3)
+    cache.put_many(['d'], [vec(4)])
+    hits = dict(zip('abcd', cache.get_many(['a', 'b', 'c', 'd'])))
+    assert hits['b'] is None
+    assert all(hits[k] is not None for k in 'acd')
+    cache.close()
+
+
+def test_read_only_cache_hands_new_vectors_to_the_writer(tmp_path):
+    reader = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=4, read_only=True)
+    # No cache on disk yet: everything misses
+    assert reader.get_many(['a']) == [None]
+    writer = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=4)
+    writer.put_many(['a'], [vec(1)])
+    writer.flush()
+
+    reader.put_many(['b'], [vec(2)])
+    hits = reader.get_many(['a', 'b', 'c'])
+    assert np.allclose(hits[0], vec(1)) and np.allclose(hits[1], vec(2)) and hits[2] is None
+    updates = reader.take_updates()
+    assert updates['keys'] == [reader.key('b')] and updates['used'] == [reader.key('a')]
+    assert reader.take_updates() is None
+
+    writer.store_many(updates['keys'], updates['vectors'])
+    writer.touch(updates['used'])
+    writer.flush()
+    fresh = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=4, read_only=True)
+    assert np.allclose(fresh.get_many(['b'])[0], vec(2))
+    writer.close()
+
+
+def test_read_only_cache_skips_slots_reused_before_commit(tmp_path):
+    writer = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=1)
+    writer.put_many(['a'], [vec(1)])
+    writer.flush()
+    reader = EmbeddingCache('model', 4, cache_dir=str(tmp_path), capacity=1, read_only=True)
+    # 'b' evicts 'a' from the only slot; the index still says 'a' lives there
+    writer.put_many(['b'], [vec(2)])
+    assert reader.get_many(['a']) == [None]
+    writer.flush()
+    assert np.allclose(reader.get_many(['b'])[0], vec(2))
+    writer.close()
@@ -0,0 +1,41 @@
+# Hybrid retrieval: fused hits have the same keys whether the dense search,
+# BM25 or both found them
+from retrieval.fanout import to_hits
+from retrieval.hybrid import HybridRetriever
+from retrieval.lexical_index import LexicalIndex
+
+KEYS = {'id', 'document', 'metadata', 'distance', 'score', 'collection', 'rrf_score'}
+TEXTS = {
+    'doc:1:0': "Annex VIII sets out the classification rules of Regulation 2017/745.",
+    'doc:1:1': "Clinical evaluation is planned and documented.",
+    'doc:2:0': "The notified body reviews the technical documentation."
+}
+
+
+class Dense:
+    # Returns fixed hits in the shape Chroma results are turned into, as if
+    # from the unified collection
+    embedder = None
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def query(self, text=None, k=10, embedding=None):
+        results = {'ids': [self.ids], 'documents': [[TEXTS[i] for i in self.ids]],
+                   'metadatas': [[{'pdf_name': 'doc'} for _ in self.ids]], 'distances': [[0.1 * (n + 1) for n in range(len(self.ids))]]}
+        return to_hits(results, 'unichunk_all')[:k]
+
+
+def test_fused_hits_share_one_shape(tmp_path):
+    lexical = LexicalIndex(str(tmp_path))
+    ids = list(TEXTS)
+    lexical.add_document('doc', ids, [TEXTS[i] for i in ids], [{'pdf_name': 'doc'} for _ in ids])
+    # 'doc:1:0' only BM25 finds, 'doc:2:0' only the dense search, 'doc:1:1' both
+    retriever = HybridRetriever(Dense(['doc:2:0', 'doc:1:1']), lexical, pdf_names=['doc'])
+    hits = {hit['id']: hit for hit in retriever.query("2017/745 classification clinical evaluation", k=5)}
+    assert set(hits) == set(TEXTS)
+    assert all(set(hit) == KEYS for hit in hits.values())
+    assert all(hit['collection'] == 'doc' for hit in hits.values())
+    assert hits['doc:1:0']['distance'] is None and hits['doc:1:0']['score'] > 0
+    assert hits['doc:2:0']['score'] is None and hits['doc:2:0']['distance'] == 0.1
+    assert hits['doc:1:1']['distance'] == 0.2 and hits['doc:1:1']['score'] > 0
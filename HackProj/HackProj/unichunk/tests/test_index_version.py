@@ -0,0 +1,25 @@
+# Index version: concurrent bumps from several processes must not lose increments
+import multiprocessing
+
+from utils.index_version import read_index_version, bump_index_version
+
+
+def _bump(path, times):
+    for _ in range(times):
+        bump_index_version(path)
+
+
+def test_missing_file_reads_as_zero(tmp_path):
+    assert read_index_version(str(tmp_path / 'index_version')) == 0
+
+
+def test_concurrent_bumps_are_not_lost(tmp_path):
+    path = str(tmp_path / 'index_version')
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_bump, args=(path, 50)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert read_index_version(path) == 200
@@ -0,0 +1,50 @@
+# Lexical index: BM25 search over segments, and segments rewritten by another
+# LexicalIndex (another process) being picked up
+from retrieval.lexical_index import LexicalIndex, tokenize, reciprocal_rank_fusion
+
+
+def add(index, pdf_name, texts):
+    ids = [f"{pdf_name}_{i}" for i in range(len(texts))]
+    index.add_document(pdf_name, ids, texts, [{'pdf_name': pdf_name, 'chunk': i} for i in range(len(texts))])
+
+
+def test_tokenize_keeps_identifiers_and_parts():
+    tokens = tokenize("Regulation (EU) 2017/745 and MDCG-2019-11")
+    assert '2017/745' in tokens and '745' in tokens
+    assert 'mdcg-2019-11' in tokens and 'mdcg' in tokens
+
+
+def test_search_ranks_exact_identifier_first(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    add(index, 'doc_a', ["General safety and performance requirements apply.",
+                         "Annex VIII sets out the classification rules of Regulation 2017/745."])
+    add(index, 'doc_b', ["Clinical evaluation is planned and documented.",
+                         "Post-market surveillance feeds the clinical evaluation."])
+    hits = index.search("2017/745 classification", k=3)
+    assert hits[0]['id'] == 'doc_a_1'
+    assert hits[0]['collection'] == 'doc_a'
+    assert hits[0]['metadata'] == {'pdf_name': 'doc_a', 'chunk': 1}
+    assert [h['collection'] for h in index.search("clinical evaluation", k=5)] == ['doc_b', 'doc_b']
+    assert index.search("clinical", pdf_names=['doc_a']) == []
+    assert index.search("nothing matches this") == []
+
+
+def test_rewritten_segment_is_seen_by_other_instances(tmp_path):
+    writer, reader = LexicalIndex(str(tmp_path)), LexicalIndex(str(tmp_path))
+    add(writer, 'doc', ["The notified body reviews the technical documentation."])
+    assert [h['id'] for h in reader.search("notified body")] == ['doc_0']
+
+    add(writer, 'doc', ["Vigilance reports go to the competent authority.", "Nothing about bodies."])
+    assert reader.search("notified body") == []
+    hits = reader.search("vigilance")
+    assert [h['document'] for h in hits] == ["Vigilance reports go to the competent authority."]
+
+    writer.delete_document('doc')
+    assert reader.segment('doc') is None
+    assert reader.search("vigilance") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'd']], k=60)
+    assert fused[0][0] == 'b'
+    assert {doc_id for doc_id, _ in fused} == {'a', 'b', 'c', 'd'}
@@ -0,0 +1,80 @@
+# Pipeline orchestrator: source order with parallel workers, batching, error
+# propagation and stopping the stages when the consumer gives up early
+import random
+import threading
+import time
+
+import pytest
+
+from pipeline.orchestrator import Pipeline, Stage, Batch, PipelineError
+
+
+def jitter(fn):
+    rng = random.Random(0)
+    lock = threading.Lock()
+
+    def wrapper(item):
+        with lock:
+            delay = rng.random() * 0.003
+        time.sleep(delay)
+        return fn(item)
+    return wrapper
+
+
+def test_results_keep_source_order_with_parallel_workers():
+    pipeline = Pipeline([
+        Stage('double', jitter(lambda x: x * 2), workers=4),
+        Stage('odd_tens', jitter(lambda x: None if x % 20 == 10 else x), workers=3),
+        Stage('inc', jitter(lambda x: x + 1), workers=2)
+    ], queue_size=2)
+    expected = [x * 2 + 1 for x in range(200) if (x * 2) % 20 != 10]
+    assert list(pipeline.run(range(200))) == expected
+    # The same pipeline runs again
+    assert list(pipeline.run(range(10))) == [1, 3, 5, 7, 9, 13, 15, 17, 19]
+
+
+def test_batches_close_on_size_and_on_close_after():
+    pipeline = Pipeline([
+        Stage('page', jitter(lambda x: x), workers=4),
+        Batch('batch', size=3, close_after=lambda x: x % 5 == 4),
+        Stage('sum', jitter(sum), workers=2)
+    ])
+    batches = Pipeline([Stage('page', jitter(lambda x: x), workers=4), Batch('batch', 3, lambda x: x % 5 == 4)])
+    assert list(batches.run(range(12))) == [[0, 1, 2], [3, 4], [5, 6, 7], [8, 9], [10, 11]]
+    assert list(pipeline.run(range(12))) == [3, 7, 18, 17, 21]
+
+
+def test_stage_error_is_raised_with_its_cause():
+    def fail_on_seven(x):
+        if x == 7:
+            raise ValueError('bad page')
+        return x
+    pipeline = Pipeline([Stage('parse', jitter(fail_on_seven), workers=3), Stage('copy', lambda x: x)])
+    with pytest.raises(PipelineError, match='parse: ValueError: bad page') as info:
+        list(pipeline.run(range(1000)))
+    assert isinstance(info.value.__cause__, ValueError)
+
+
+def test_source_error_is_raised():
+    def items():
+        yield 1
+        raise OSError('unreadable')
+    with pytest.raises(PipelineError, match='source: OSError: unreadable'):
+        list(Pipeline([Stage('copy', lambda x: x, workers=2)]).run(items()))
+
+
+def test_closing_early_stops_every_stage():
+    produced = []
+
+    def items():
+        for i in range(10000):
+            produced.append(i)
+            yield i
+    pipeline = Pipeline([Stage('slow_copy', jitter(lambda x: x), workers=3), Batch('early_batch', 2)], queue_size=2)
+    results = pipeline.run(items())
+    assert next(results) == [0, 1]
+    results.close()
+    alive = [t.name for t in threading.enumerate() if t.name.startswith(('slow_copy', 'early_batch'))]
+    assert alive == []
+    # Backpressure kept the source from running ahead
+    assert len(produced) < 100
@@ -0,0 +1,38 @@
+# Query builder: only real follow-ups borrow terms from the previous question
+import numpy as np
+import pytest
+
+from retrieval.query_builder import QueryBuilder, is_follow_up
+
+
+class FakeEmbedder:
+    def embed(self, texts):
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+
+@pytest.mark.parametrize('question', [
+    "what about that?",
+    "And the annex?",
+    "Does it apply to class III devices?",
+    "This applies to software too?",
+    "Why is that needed?",
+])
+def test_follow_ups(question):
+    assert is_follow_up(question)
+
+
+@pytest.mark.parametrize('question', [
+    "What does this regulation require from notified bodies for class III devices?",
+    "Which annex lists the general safety and performance requirements that it refers to?",
+    "How is clinical evaluation documented in the technical documentation?",
+])
+def test_standalone_questions(question):
+    assert not is_follow_up(question)
+
+
+def test_rewrite_borrows_previous_terms_only_for_follow_ups():
+    builder = QueryBuilder(FakeEmbedder(), rewrite=True, history_weight=0.0)
+    history = ["What are the obligations of notified bodies?"]
+    assert builder.build("what about that?", history)['text'] == "what about that? obligations notified bodies"
+    standalone = "How is clinical evaluation documented in the technical documentation?"
+    assert builder.build(standalone, history)['text'] == standalone
@@ -0,0 +1,42 @@
+# Text chunker: chunk_ranges must describe exactly the chunks chunk_text returns
+import random
+
+from chunker.text_chunker import chunk_text, chunk_ranges
+
+WORDS = "device clinical evaluation annex regulation 2017/745 notified body risk class".split()
+
+
+def squash(text):
+    # chunk_text joins the overlap to the chunk without the newline between them
+    return ''.join(text.split())
+
+
+def paragraphs(rng, count, longest):
+    return '\n'.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, longest))) for _ in range(count))
+
+
+def check(text, chunk_size, overlap):
+    chunks = chunk_text(text, chunk_size, overlap)
+    ranges = chunk_ranges(text, chunk_size, overlap)
+    assert len(ranges) == len(chunks)
+    for chunk, (start, end) in zip(chunks, ranges):
+        assert squash(text[start:end]) == squash(chunk)
+
+
+def test_ranges_match_chunks():
+    rng = random.Random(0)
+    for _ in range(200):
+        text = paragraphs(rng, rng.randint(1, 40), rng.choice((5, 20, 80)))
+        check(text, chunk_size=rng.choice((100, 300, 1000)), overlap=rng.choice((1, 20, 100)))
+
+
+def test_oversized_paragraphs_and_short_neighbours():
+    long = ' '.join(['regulation'] * 60)
+    # Oversized first paragraph (chunk_text emits an empty first chunk), and a
+    # chunk shorter than the overlap before an oversized one
+    for text in (long, f"{long}\nshort", f"short\n{long}\nshort", f"a\nb\n{long}\n{long}"):
+        check(text, chunk_size=200, overlap=50)
+
+
+def test_empty_text():
+    assert chunk_text("\n \n") == [] and chunk_ranges("\n \n") == []
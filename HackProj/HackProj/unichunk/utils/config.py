@@ -3,4 +3,152 @@ import os
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '../../Dataset')
 CHROMA_DB_DIR = os.path.join(os.path.dirname(__file__), '../chroma_db')
+OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../output'))
+CHROMA_PERSIST_DIR = os.path.join(OUTPUT_DIR, 'chroma_db')
 
+# OCR
+OCR_DPI = 300
+OCR_WORKERS = 4
+# Image regions smaller than this (in PDF points^2) are not worth OCR'ing on mixed pages
+MIN_OCR_REGION_AREA = 5000
+# Fraction of an image region that may be covered by native text before it is skipped
+MAX_TEXT_COVERAGE = 0.5
+
+# Embedded image extraction
+IMAGE_WRITE_WORKERS = 4
+
+# Image embedding
+EMBED_IMAGES = True
+IMAGE_EMBED_BATCH_SIZE = 16
+IMAGE_DECODE_WORKERS = 4
+IMAGE_SIZE = 224
+
+# Embedding models and backends: 'torch', 'torch-int8', 'onnx', 'onnx-int8'
+TEXT_EMBED_MODEL = 'all-MiniLM-L6-v2'
+TEXT_EMBED_BACKEND = os.environ.get('UNICHUNK_TEXT_BACKEND', 'torch')
+IMAGE_EMBED_MODEL = 'openai/clip-vit-base-patch32'
+IMAGE_EMBED_BACKEND = os.environ.get('UNICHUNK_IMAGE_BACKEND', 'torch')
+ONNX_CACHE_DIR = os.path.join(OUTPUT_DIR, 'onnx')
+# 0 lets ONNX Runtime pick the number of intra-op threads
+ONNX_THREADS = 0
+
+# Persistent embedding cache (normalized text hash + model -> vector)
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_DIR = os.path.join(OUTPUT_DIR, 'embedding_cache')
+EMBED_CACHE_CAPACITY = 200000
+
+# Length-bucketed text embedding: padded tokens per batch, max texts per batch,
+# and worker processes (1 encodes in-process)
+EMBED_TOKEN_BUDGET = 8192
+EMBED_MAX_BATCH_SIZE = 128
+EMBED_PROCESSES = 1
+
+# Retrieval
+RETRIEVAL_TOP_K = 5
+RETRIEVAL_WORKERS = 8
+
+# Vector store layout: 'unified' keeps every document in one collection filtered
+# by pdf_name metadata; 'per_pdf' creates one collection per uploaded PDF
+COLLECTION_LAYOUT = os.environ.get('UNICHUNK_COLLECTION_LAYOUT', 'unified')
+UNIFIED_COLLECTION_NAME = 'unichunks'
+
+# Hybrid lexical + dense retrieval
+HYBRID_RETRIEVAL = True
+LEXICAL_INDEX_DIR = os.path.join(OUTPUT_DIR, 'lexical_index')
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+# Candidates taken from each of the dense and lexical rankings before fusion
+HYBRID_CANDIDATES = 20
+
+# Optional cross-encoder reranking of over-fetched candidates
+RERANK_ENABLED = os.environ.get('UNICHUNK_RERANK', '0') == '1'
+RERANK_MODEL = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+RERANK_CANDIDATES = 20
+RERANK_TOP_K = 4
+RERANK_BATCH_SIZE = 8
+# Seconds; batches that would overrun the budget are skipped and keep retrieval order
+RERANK_TIME_BUDGET = 0.5
+
+# Query result cache: exact match on normalized query + documents + index version,
+# plus an optional semantic match on the query embedding
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_CAPACITY = 256
+QUERY_CACHE_TTL = 3600
+# Cosine similarity above which a cached answer is reused; None disables the semantic layer
+QUERY_CACHE_SEMANTIC_THRESHOLD = 0.97
+INDEX_VERSION_FILE = os.path.join(OUTPUT_DIR, 'index_version')
+
+# Retrieval query construction from the current question and chat history
+QUERY_REWRITE = True
+# Weight of the previous user turns' embeddings mixed into the question embedding (0 disables)
+QUERY_HISTORY_WEIGHT = 0.0
+QUERY_HISTORY_TURNS = 2
+
+# Answer generation
+# 'gemini' or 'echo' (offline, deterministic stand-in; no API key needed)
+ANSWER_GENERATOR = os.environ.get('UNICHUNK_GENERATOR', 'gemini')
+# Simulated latency of the echo generator, in seconds
+ECHO_FIRST_TOKEN_DELAY = 0.0
+ECHO_TOKEN_DELAY = 0.0
+GEMINI_MODEL = 'gemini-1.5-flash'
+GEMINI_TIMEOUT = 30
+
+# Prompt context assembly
+CONTEXT_TOKEN_BUDGET = 2000
+
+# Text chunking (characters)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+# Ingestion pipeline: items waiting between two stages, and threads per stage
+PIPELINE_QUEUE_SIZE = 4
+PIPELINE_OCR_WORKERS = OCR_WORKERS
+PIPELINE_CHUNK_WORKERS = 1
+PIPELINE_EMBED_WORKERS = 1
+# Run the pdfplumber/OpenCV layout stage (only test_pipeline.py needs its elements)
+PIPELINE_LAYOUT = False
+# Extract tables (on pre-screened pages) and index them as table chunks
+PIPELINE_TABLES = True
+# A page is a table candidate with this many horizontal and vertical ruling
+# segments of at least this length (points); pdfplumber's line strategy needs two of each
+TABLE_MIN_RULES = 2
+TABLE_MIN_RULE_LENGTH = 3.0
+
+# Batch ingestion
+INGEST_WORKERS = 2
+# Pages extracted, embedded and written together; also the resume granularity
+INDEX_PAGE_BATCH = 8
+INGEST_LEDGER_PATH = os.path.join(OUTPUT_DIR, 'ingest_ledger.sqlite')
+# How often the app's ingestion service and progress display poll, in seconds
+INGEST_POLL_SECONDS = 1.0
+# Ingest worker memory: past this RSS (MB, 0 = no limit) or after this many
+# pages (0 = never), a worker hands its document back at the next batch
+# boundary and is replaced by a fresh process
+INGEST_WORKER_RSS_MB = int(os.environ.get('UNICHUNK_WORKER_RSS_MB', 3072))
+INGEST_RECYCLE_PAGES = 2000
+# Times a document resumes after its worker died (e.g. OOM-killed) before it is marked failed
+INGEST_MAX_RESTARTS = 3
+
+# Uploaded PDFs, stored by content hash
+UPLOAD_DIR = os.path.join(OUTPUT_DIR, 'uploads')
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Rendered reference previews
+PREVIEW_CACHE_DIR = os.path.join(OUTPUT_DIR, 'previews')
+PREVIEW_CACHE_BYTES = 512 * 1024 * 1024
+PREVIEW_ZOOM = 2.0
+# Page points shown around a highlighted chunk
+PREVIEW_MARGIN = 24
+# Render every page into the preview cache while ingesting
+PREVIEW_PRERENDER = os.environ.get('UNICHUNK_PRERENDER', '0') == '1'
+
+# Metrics: histogram bucket bounds in seconds, and how many recent spans to keep
+METRICS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_RECENT_SPANS = 1000
+METRICS_FILE = os.path.join(OUTPUT_DIR, 'metrics.json')
+# Serve Prometheus text on this local port from the app (0 = off)
+METRICS_PORT = int(os.environ.get('UNICHUNK_METRICS_PORT', '0'))
+# Comma-separated stages to run under cProfile ('*' for all), e.g. "render_ocr,embed"
+PROFILE_STAGES = [s for s in os.environ.get('UNICHUNK_PROFILE', '').split(',') if s]
+PROFILE_DIR = os.path.join(OUTPUT_DIR, 'profiles')
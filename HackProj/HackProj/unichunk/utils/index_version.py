@@ -0,0 +1,54 @@
+# Index version
+# A counter bumped whenever documents are (re)ingested, so caches built on top
+# of the vector store and lexical index can tell they are stale. The app's
+# ingest service and the batch CLI can bump it at the same time, so a bump
+# holds an exclusive lock on a sidecar file while it reads and rewrites it.
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from utils.config import INDEX_VERSION_FILE
+
+
+@contextmanager
+def _locked(path):
+    with open(f"{path}.lock", 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            # LK_LOCK retries for about 10 seconds before raising OSError
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_index_version(path=INDEX_VERSION_FILE):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_index_version(path=INDEX_VERSION_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _locked(path):
+        version = read_index_version(path) + 1
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(version))
+        os.replace(tmp_path, path)
+    return version
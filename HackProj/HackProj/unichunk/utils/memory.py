@@ -0,0 +1,44 @@
+# Memory
+# Resident set size of the current process and the governor that ingest
+# workers consult after every page batch. RSS comes from /proc/self/statm,
+# then psutil if it is installed, then the ru_maxrss peak as a last resort.
+import os
+import sys
+
+from utils.config import INGEST_WORKER_RSS_MB, INGEST_RECYCLE_PAGES
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # Kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class MemoryGovernor:
+    def __init__(self, limit_mb=INGEST_WORKER_RSS_MB, recycle_pages=INGEST_RECYCLE_PAGES):
+        self.limit_mb = limit_mb
+        self.recycle_pages = recycle_pages
+        self.pages = 0
+
+    def add_pages(self, count):
+        self.pages += count
+
+    def exhausted(self):
+        # Why this process should stop taking work, or None
+        if self.recycle_pages and self.pages >= self.recycle_pages:
+            return f"recycled after {self.pages} pages"
+        if self.limit_mb:
+            rss = rss_mb()
+            if rss > self.limit_mb:
+                return f"RSS {rss:.0f}MB over the {self.limit_mb}MB limit"
+        return None
@@ -0,0 +1,244 @@
+# Metrics
+# Process-wide timing histograms, counters and recent spans for the ingestion
+# and query paths. Exported as a JSON file or Prometheus text (optionally over
+# a local HTTP endpoint). Worker processes send snapshots that the owning
+# process merges. Stages listed in UNICHUNK_PROFILE ('*' for all) also run
+# under cProfile, and per-stage .prof files are written at exit for pstats or
+# snakeviz. Threads are named after their stage for py-spy --threads.
+import atexit
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from utils.config import METRICS_BUCKETS, METRICS_RECENT_SPANS, PROFILE_STAGES, PROFILE_DIR
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'buckets': list(self.buckets), 'counts': list(self.counts)}
+
+    def merge(self, data):
+        if tuple(data['buckets']) != self.buckets:
+            return
+        self.counts = [a + b for a, b in zip(self.counts, data['counts'])]
+        self.count += data['count']
+        self.sum += data['sum']
+
+
+class Metrics:
+    def __init__(self, profile_stages=PROFILE_STAGES, profile_dir=PROFILE_DIR):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=METRICS_RECENT_SPANS)
+        self.profile_stages = set(profile_stages)
+        self.profile_dir = profile_dir
+        self._profiles = {}
+        self._profiling = threading.local()
+        if self.profile_stages:
+            atexit.register(self.dump_profiles)
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def record(self, name, seconds, **attrs):
+        # Keeps one span (e.g. a document or a page) in the recent spans list;
+        # attrs such as document names stay out of the histogram labels
+        with self._lock:
+            self.spans.append({'name': name, 'attrs': {k: str(v) for k, v in attrs.items()},
+                               'start': time.time() - seconds, 'seconds': seconds})
+
+    @contextmanager
+    def span(self, name, attrs=None, **labels):
+        # Times the block into the "<name>_seconds" histogram; with attrs it is
+        # also recorded as a span
+        profiler = self._start_profile(name, labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self._profiling.active = False
+            self.observe(f"{name}_seconds", seconds, **labels)
+            if attrs is not None:
+                self.record(name, seconds, **labels, **attrs)
+
+    def timed(self, name, **labels):
+        def decorator(fn):
+            def wrapper(*args, **kwargs):
+                with self.span(name, **labels):
+                    return fn(*args, **kwargs)
+            wrapper.__name__ = fn.__name__
+            wrapper.__doc__ = fn.__doc__
+            return wrapper
+        return decorator
+
+    # --- profiling ---
+
+    def _start_profile(self, name, labels):
+        if not self.profile_stages:
+            return None
+        stage = labels.get('stage', name)
+        if '*' not in self.profile_stages and stage not in self.profile_stages:
+            return None
+        if getattr(self._profiling, 'active', False):
+            # A nested span; the enclosing stage's profiler already covers it
+            return None
+        with self._lock:
+            profiler = self._profiles.setdefault(stage, {}).setdefault(threading.get_ident(), cProfile.Profile())
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one profiler can be active at a time on some Python versions
+            return None
+        self._profiling.active = True
+        return profiler
+
+    def dump_profiles(self):
+        import pstats
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self._lock:
+            profiles = {stage: list(by_thread.values()) for stage, by_thread in self._profiles.items()}
+        for stage, profilers in profiles.items():
+            stats = None
+            for profiler in profilers:
+                try:
+                    stats = pstats.Stats(profiler) if stats is None else stats.add(profiler)
+                except TypeError:
+                    # Never enabled, so there is nothing to add
+                    continue
+            if stats is not None:
+                stats.dump_stats(os.path.join(self.profile_dir, f"{stage}-{os.getpid()}.prof"))
+
+    # --- export ---
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            data = {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), hist.to_dict()] for (name, labels), hist in self.histograms.items()],
+                'spans': list(self.spans)
+            }
+            if reset:
+                self.counters, self.histograms = {}, {}
+                self.spans.clear()
+        return data
+
+    def merge(self, data):
+        for name, labels, value in data['counters']:
+            self.inc(name, value, **labels)
+        for name, labels, hist in data['histograms']:
+            key = _key(name, labels)
+            with self._lock:
+                self.histograms.setdefault(key, Histogram(hist['buckets'])).merge(hist)
+        with self._lock:
+            self.spans.extend(data['spans'])
+
+    def summary(self):
+        # {name{labels}: {count, mean, p50, p95}} for quick printing
+        out = {}
+        with self._lock:
+            for (name, labels), hist in sorted(self.histograms.items()):
+                label = ','.join(f"{k}={v}" for k, v in labels)
+                out[f"{name}{{{label}}}" if label else name] = {
+                    'count': hist.count, 'mean': hist.sum / hist.count if hist.count else 0.0,
+                    'p50': hist.quantile(0.5), 'p95': hist.quantile(0.95)
+                }
+        return out
+
+    def write_json(self, path):
+        data = self.snapshot()
+        data['summary'] = self.summary()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def prometheus_text(self):
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"unichunk_{name}{fmt(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(hist.buckets + (float('inf'),), hist.counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                    lines.append(f"unichunk_{name}_bucket{fmt(labels, [('le', le)])} {cumulative}")
+                lines.append(f"unichunk_{name}_sum{fmt(labels)} {hist.sum}")
+                lines.append(f"unichunk_{name}_count{fmt(labels)} {hist.count}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port):
+        # Prometheus text endpoint on http://127.0.0.1:<port>/metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
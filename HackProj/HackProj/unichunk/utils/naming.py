@@ -0,0 +1,20 @@
+# Naming helpers
+import os
+import re
+
+
+def sanitize_collection_name(name):
+    name = re.sub(r'[^a-zA-Z0-9._-]', '_', name)
+    name = name.strip('_-.')
+    if len(name) < 3:
+        name = (name + '_db')[:3]
+    if len(name) > 512:
+        name = name[:512]
+    return name
+
+
+def document_name(pdf_path, root=None):
+    # Documents found by crawling are named after their path below the crawl
+    # root, so equally named files in different folders do not collide
+    rel = os.path.relpath(pdf_path, root) if root else os.path.basename(pdf_path)
+    return sanitize_collection_name(os.path.splitext(rel)[0])
@@ -0,0 +1,145 @@
+# Preview Cache
+# Rendered PDF pages on disk, keyed by (document hash, page, zoom), so a
+# reference preview is rendered once instead of on every rerun. Files are
+# touched on every hit and the least recently used ones are deleted once the
+# cache grows past its size limit. Highlighted previews render only the part
+# of the page around a chunk's boxes and are cached under the same scheme.
+import hashlib
+import io
+import os
+import re
+import threading
+
+from utils.config import PREVIEW_CACHE_DIR, PREVIEW_CACHE_BYTES, PREVIEW_ZOOM, PREVIEW_MARGIN
+
+HASH_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+class PreviewCache:
+    def __init__(self, root=PREVIEW_CACHE_DIR, capacity_bytes=PREVIEW_CACHE_BYTES):
+        self.root = root
+        self.capacity_bytes = capacity_bytes
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._hashes = {}
+        self._size = None
+        self.stats = {'hits': 0, 'renders': 0, 'evictions': 0}
+
+    def document_hash(self, pdf_path):
+        # Uploads are already stored under their content hash
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        if HASH_RE.match(stem):
+            return stem
+        key = (pdf_path, os.path.getmtime(pdf_path))
+        if key not in self._hashes:
+            from ingestion.upload_store import file_digest
+            with open(pdf_path, 'rb') as f:
+                self._hashes[key] = file_digest(f)
+        return self._hashes[key]
+
+    def path(self, doc_hash, page_no, zoom=PREVIEW_ZOOM, variant=''):
+        return os.path.join(self.root, doc_hash, f"{int(page_no)}@{zoom:g}{variant}.png")
+
+    def get(self, doc_hash, page_no, zoom=PREVIEW_ZOOM, variant=''):
+        path = self.path(doc_hash, page_no, zoom, variant)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self.stats['hits'] += 1
+        return path
+
+    def put_page(self, doc_hash, page, zoom=PREVIEW_ZOOM):
+        # page is an open fitz page
+        import fitz
+        path = self.path(doc_hash, page.number + 1, zoom)
+        return self._write(path, page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes('png'))
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.stats['renders'] += 1
+        self._added(len(data))
+        return path
+
+    def render(self, pdf_path, page_no, zoom=PREVIEW_ZOOM):
+        doc_hash = self.document_hash(pdf_path)
+        path = self.get(doc_hash, page_no, zoom)
+        if path is None:
+            import fitz
+            with fitz.open(pdf_path) as doc:
+                path = self.put_page(doc_hash, doc[int(page_no) - 1], zoom)
+        return path
+
+    def highlight(self, pdf_path, page_no, boxes, zoom=PREVIEW_ZOOM, margin=PREVIEW_MARGIN):
+        # Renders only the region around `boxes` (page coordinates) with the boxes highlighted
+        doc_hash = self.document_hash(pdf_path)
+        variant = '-' + hashlib.sha1(repr((boxes, margin)).encode()).hexdigest()[:12]
+        path = self.get(doc_hash, page_no, zoom, variant)
+        if path is not None:
+            return path
+        import fitz
+        from PIL import Image, ImageDraw
+        with fitz.open(pdf_path) as doc:
+            page = doc[int(page_no) - 1]
+            rects = [fitz.Rect(box) for box in boxes]
+            clip = fitz.Rect(rects[0])
+            for rect in rects[1:]:
+                clip |= rect
+            # Boxes are in unrotated page space, clip and pixmap in rotated space
+            clip = ((clip + (-margin, -margin, margin, margin)) * page.rotation_matrix) & page.rect
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip)
+            origin = clip.top_left
+            image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples).convert('RGBA')
+            overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(overlay)
+            for rect in rects:
+                r = rect * page.rotation_matrix
+                draw.rectangle([(r.x0 - origin.x) * zoom, (r.y0 - origin.y) * zoom, (r.x1 - origin.x) * zoom, (r.y1 - origin.y) * zoom],
+                               fill=(255, 230, 0, 90), outline=(230, 160, 0, 255))
+        out = io.BytesIO()
+        Image.alpha_composite(image, overlay).convert('RGB').save(out, format='PNG')
+        return self._write(self.path(doc_hash, page_no, zoom, variant), out.getvalue())
+
+    def prerender(self, pdf_path, zoom=PREVIEW_ZOOM):
+        import fitz
+        doc_hash = self.document_hash(pdf_path)
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                if self.get(doc_hash, page.number + 1, zoom) is None:
+                    self.put_page(doc_hash, page, zoom)
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith('.png'):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _added(self, size):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(s for _, s, _ in self._files())
+            else:
+                self._size += size
+            if self._size <= self.capacity_bytes:
+                return
+            # Other processes may have added or evicted files, so recount
+            files = sorted(self._files())
+            self._size = sum(s for _, s, _ in files)
+            for _, size, path in files:
+                if self._size <= self.capacity_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._size -= size
+                self.stats['evictions'] += 1
@@ -1,14 +1,62 @@
 # Chroma Vector Store
+# One shared collection for all documents; each chunk carries a pdf_name
+# metadata field used for filtering queries and deleting a document
+import uuid
+
 import chromadb
 from chromadb.config import Settings
 
+from utils.config import UNIFIED_COLLECTION_NAME
+from utils.metrics import METRICS
+
 class ChromaStore:
-    def __init__(self, persist_directory='chroma_db'):
-        self.client = chromadb.Client(Settings(persist_directory=persist_directory))
-        self.collection = self.client.get_or_create_collection('unichunks')
+    def __init__(self, persist_directory='chroma_db', collection_name=UNIFIED_COLLECTION_NAME, embedding_function=None, client=None, metadata=None):
+        self.client = client or chromadb.Client(Settings(persist_directory=persist_directory, is_persistent=True, anonymized_telemetry=False))
+        kwargs = {'metadata': metadata} if metadata else {}
+        if embedding_function is not None:
+            kwargs['embedding_function'] = embedding_function
+        self.collection = self.client.get_or_create_collection(collection_name, **kwargs)
 
     def add(self, embedding, metadata):
-        self.collection.add(embeddings=[embedding], metadatas=[metadata])
+        self.collection.add(ids=[str(uuid.uuid4())], embeddings=[embedding], metadatas=[metadata])
+
+    def add_chunks(self, documents=None, metadatas=None, ids=None, embeddings=None):
+        count = len(documents if documents is not None else embeddings)
+        if count == 0:
+            return
+        kwargs = {'ids': ids or [str(uuid.uuid4()) for _ in range(count)], 'metadatas': metadatas}
+        if documents is not None:
+            kwargs['documents'] = documents
+        if embeddings is not None:
+            kwargs['embeddings'] = embeddings
+        with METRICS.span('chroma', op='upsert'):
+            self.collection.upsert(**kwargs)
+        METRICS.inc('chunks_stored_total', count)
+
+    def get_document(self, pdf_name):
+        # All chunks of one document, in page and chunk order
+        results = self.collection.get(where={"pdf_name": pdf_name}, include=['documents', 'metadatas'])
+        rows = sorted(zip(results['ids'], results['documents'], results['metadatas']),
+                      key=lambda r: (r[2].get('page_no', 0), r[2].get('chunk_idx', 0)))
+        return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+    def delete_document(self, pdf_name):
+        self.collection.delete(where={"pdf_name": pdf_name})
+
+    @staticmethod
+    def document_filter(pdf_names):
+        if not pdf_names:
+            return None
+        pdf_names = list(pdf_names)
+        if len(pdf_names) == 1:
+            return {"pdf_name": pdf_names[0]}
+        return {"pdf_name": {"$in": pdf_names}}
 
-    def query(self, embedding, top_k=5):
-        return self.collection.query(query_embeddings=[embedding], n_results=top_k)
+    @METRICS.timed('chroma', op='query')
+    def query(self, embedding, top_k=5, pdf_names=None):
+        return self.collection.query(
+            query_embeddings=[embedding],
+            n_results=top_k,
+            where=self.document_filter(pdf_names),
+            include=['documents', 'metadatas', 'distances']
+        )